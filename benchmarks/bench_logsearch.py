@@ -0,0 +1,115 @@
+"""
+Benchmark de l'index de recherche des logs.
+
+Mesure, sur un log synthétique au format "ts" (moreutils) :
+- le débit de l'indexation initiale et la mémoire occupée par l'index ;
+- le coût d'une indexation incrémentale après un ajout ;
+- la durée d'une recherche (terme rare, terme fréquent) avec l'index,
+  et sans index (parcours linéaire du fichier).
+
+Usage (depuis la racine du dépôt) :
+    python benchmarks/bench_logsearch.py [--size 20] [--repeat 5]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+WORDS = [
+    "connecting", "to", "database", "backup", "completed", "rows", "exported", "uploading", "archive",
+    "checksum", "ok", "retrying", "request", "timeout", "worker", "processed", "items", "cache", "hit", "miss",
+]
+
+
+def write_log(path: str, size_mb: float, start: datetime) -> int:
+    """Écrit un log d'environ size_mb Mo : une exécution par minute, avec un terme rare"""
+    rng = random.Random(42)
+    moment = start
+    written = 0
+    lines = 0
+    with open(path, "w") as f:
+        while written < size_mb * 1024 * 1024:
+            for _ in range(rng.randint(20, 60)):
+                words = " ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 12)))
+                line = f"{moment:%b %d %H:%M:%S} {words} id={rng.randint(0, 10 ** 6)}\n"
+                if rng.random() < 0.0001:
+                    line = f"{moment:%b %d %H:%M:%S} ConnectionRefusedError: [Errno 111]\n"
+                f.write(line)
+                written += len(line)
+                lines += 1
+            moment += timedelta(minutes=1)
+    return lines
+
+
+def time_search(index, query: str, repeat: int, **kwargs) -> tuple:
+    """Durée médiane (secondes) et nombre de résultats d'une recherche"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = list(index.search(query, **kwargs))
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), len(results)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=float, default=20, help="taille du log (Mo)")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    from logsearch import LogIndex
+
+    with tempfile.TemporaryDirectory() as log_dir:
+        path = os.path.join(log_dir, "bench.log")
+        lines = write_log(path, args.size, datetime.now() - timedelta(days=20))
+        size = os.path.getsize(path)
+        print(f"Log: {size / 1024 / 1024:.1f} MB, {lines} lines")
+
+        linear = LogIndex(log_dir)
+        index = LogIndex(log_dir)
+        start = time.perf_counter()
+        index.refresh()
+        elapsed = time.perf_counter() - start
+
+        # Mémoire mesurée sur une seconde indexation (tracemalloc ralentit l'exécution)
+        tracemalloc.start()
+        measured = LogIndex(log_dir)
+        measured.refresh()
+        memory, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del measured
+        print("\nInitial indexing")
+        print(f"  time     {elapsed:8.2f} s  ({size / 1024 / 1024 / elapsed:.1f} MB/s)")
+        print(f"  memory   {memory / 1024 / 1024:8.2f} MB  (peak {peak / 1024 / 1024:.2f} MB)")
+
+        with open(path, "a") as f:
+            f.write(f"{datetime.now():%b %d %H:%M:%S} appended line\n" * 2000)
+        start = time.perf_counter()
+        index.refresh()
+        print(f"  append   {(time.perf_counter() - start) * 1000:8.1f} ms  (2000 lines)")
+
+        print(f"\nSearch (median of {args.repeat})")
+        print(f"  {'query':<28} {'indexed':>10} {'linear':>10} {'matches':>8}")
+        queries = [
+            ("ConnectionRefused", {}),
+            ("checksum ok", {"limit": 100}),
+            ("appended line", {"context": 2}),
+            ("ConnectionRefused, last day", {"since": datetime.now() - timedelta(days=1)}),
+        ]
+        for label, kwargs in queries:
+            query = label.split(",")[0]
+            indexed, count = time_search(index, query, args.repeat, **kwargs)
+            scanned, _ = time_search(linear, query, args.repeat, **kwargs)
+            print(f"  {label:<28} {indexed * 1000:7.1f} ms {scanned * 1000:7.1f} ms {count:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Benchmark du démarrage de l'application.
+
+Mesure :
+- le temps d'import à froid de main.py (interpréteur neuf) ;
+- le temps de synchronisation DB -> crontab selon le nombre de jobs,
+  job par job (sync_job_to_cron) et en lot (sync_jobs_to_cron).
+
+Le crontab système n'est pas modifié : un crontab temporaire est utilisé.
+
+Usage (depuis la racine du dépôt) :
+    python benchmarks/bench_startup.py [--jobs 10 100 1000] [--repeat 5]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+
+def measure_cold_import(module: str, repeat: int) -> float:
+    """Temps médian d'import d'un module dans un interpréteur neuf (secondes)"""
+    code = (
+        "import time; start = time.perf_counter(); "
+        f"import {module}; print(time.perf_counter() - start)"
+    )
+    timings = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", code], cwd=ROOT_DIR, capture_output=True, text=True, check=True
+        )
+        timings.append(float(output.stdout.strip().splitlines()[-1]))
+    return statistics.median(timings)
+
+
+def make_jobs(count: int) -> list:
+    return [
+        SimpleNamespace(
+            id=i, name=f"job_{i}", command=f"echo {i}", schedule="*/5 * * * *", is_active=i % 2 == 0, upstreams=[]
+        )
+        for i in range(count)
+    ]
+
+
+def measure_sync(count: int, batch: bool) -> float:
+    """Temps de synchronisation de `count` jobs vers un crontab temporaire vide (secondes)"""
+    from crontab import CronTab
+    import cronservice
+
+    with tempfile.NamedTemporaryFile("w", suffix=".cron", delete=False) as tab:
+        tab_path = tab.name
+    try:
+        cronservice._cron = CronTab(tabfile=tab_path)
+        jobs = make_jobs(count)
+        start = time.perf_counter()
+        if batch:
+            cronservice.sync_jobs_to_cron(jobs)
+        else:
+            for job in jobs:
+                cronservice.sync_job_to_cron(job.command, job.name, job.schedule, job.id, job.is_active)
+        return time.perf_counter() - start
+    finally:
+        cronservice._cron = None
+        os.unlink(tab_path)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print("Cold import (median)")
+    print(f"  main    {measure_cold_import('main', args.repeat) * 1000:8.1f} ms")
+
+    print("\nCrontab sync")
+    print(f"  {'jobs':>6}  {'per job':>10}  {'batch':>10}")
+    for count in args.jobs:
+        per_job = measure_sync(count, batch=False)
+        batch = measure_sync(count, batch=True)
+        print(f"  {count:>6}  {per_job * 1000:8.1f} ms  {batch * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+import hashlib
+import os
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+from urllib.parse import parse_qs
+
+from fastapi import Request
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import Response
+from fastapi.staticfiles import StaticFiles
+
+from utils import Name, get_log_path, get_status_path
+
+STATIC_DIR = Path("static")
+
+# Les assets fingerprintés (?v=<hash>) ne changent jamais pour une URL donnée
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# Noms des jobs par id, valables pour une version donnée de la table
+_job_names = {"version": -1, "names": {}}
+
+# Empreintes des fichiers statiques par chemin : (mtime_ns, hash)
+_static_hashes = {}
+
+
+def bump_job_table_version(db) -> None:
+    """
+    Signale une modification de la table des jobs (invalide les ETags).
+    Le compteur est en base et incrémenté dans la transaction de la modification :
+    toutes les instances partageant la base voient le changement.
+    """
+    from models import JobTableVersion
+
+    db.query(JobTableVersion).filter(JobTableVersion.id == 1).update(
+        {JobTableVersion.version: JobTableVersion.version + 1, JobTableVersion.updated_at: time.time()},
+        synchronize_session=False,
+    )
+
+
+def get_job_table_version(db) -> tuple[int, float]:
+    """
+    Retourne la version de la table des jobs et la date de sa dernière modification.
+
+    Returns:
+        tuple: (version, timestamp POSIX)
+    """
+    from models import JobTableVersion
+
+    row = db.query(JobTableVersion.version, JobTableVersion.updated_at).filter(JobTableVersion.id == 1).first()
+    if row is None:
+        return 0, 0.0
+    return row.version, row.updated_at
+
+
+def get_job_names(db, version: int = None) -> dict:
+    """
+    Retourne les noms des jobs par id.
+    La table des jobs n'est relue que si sa version a changé depuis le dernier appel.
+    """
+    if version is None:
+        version = get_job_table_version(db)[0]
+    if _job_names["version"] != version:
+        from models import Job
+
+        _job_names["names"] = dict(db.query(Job.id, Job.name).all())
+        _job_names["version"] = version
+    return _job_names["names"]
+
+
+def get_log_stamp(name: Name) -> tuple[int, int]:
+    """
+    Retourne (mtime_ns, taille) du fichier de log d'un job, sans le lire.
+
+    Returns:
+        tuple: (0, 0) si le fichier n'existe pas
+    """
+    try:
+        stat_result = os.stat(get_log_path(name))
+        return stat_result.st_mtime_ns, stat_result.st_size
+    except FileNotFoundError:
+        return 0, 0
+
+
+def get_status_stamp(job_id: int) -> int:
+    """
+    Retourne le mtime_ns du fichier de statut d'un job : une exécution sans sortie
+    ne modifie pas le log, mais réécrit son statut.
+
+    Returns:
+        int: 0 si le fichier n'existe pas
+    """
+    try:
+        return os.stat(get_status_path(job_id)).st_mtime_ns
+    except FileNotFoundError:
+        return 0
+
+
+def compute_etag(version: int, *parts) -> str:
+    """Construit un ETag faible (la compression modifie les octets envoyés)"""
+    digest = hashlib.md5(repr((version,) + parts).encode()).hexdigest()
+    return f'W/"{digest}"'
+
+
+def compute_last_modified(table_modified: float, *mtimes_ns: int) -> float:
+    """Date de dernière modification : la plus récente entre la table et les logs donnés"""
+    return max([table_modified] + [mtime / 1e9 for mtime in mtimes_ns])
+
+
+def is_not_modified(request: Request, etag: str, last_modified: float) -> bool:
+    """
+    Vérifie les en-têtes conditionnels de la requête.
+    If-None-Match est prioritaire sur If-Modified-Since (RFC 7232).
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        # Comparaison faible : on ignore le préfixe W/
+        candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return etag.removeprefix("W/") in candidates
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is not None:
+        try:
+            return int(last_modified) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+
+    return False
+
+
+def cache_headers(etag: str, last_modified: float) -> dict:
+    """En-têtes de validation : le navigateur revalide à chaque affichage"""
+    return {
+        "ETag": etag,
+        "Last-Modified": formatdate(last_modified, usegmt=True),
+        "Cache-Control": "no-cache",
+    }
+
+
+def not_modified_response(etag: str, last_modified: float, headers: dict = None) -> Response:
+    return Response(status_code=304, headers={**cache_headers(etag, last_modified), **(headers or {})})
+
+
+def static_url(path: str) -> str:
+    """
+    Retourne l'URL fingerprintée d'un fichier statique (/static/<path>?v=<hash>).
+    Le hash est recalculé uniquement si le fichier a été modifié.
+    """
+    full_path = STATIC_DIR / path
+    try:
+        mtime_ns = full_path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return f"/static/{path}"
+
+    cached = _static_hashes.get(path)
+    if cached is None or cached[0] != mtime_ns:
+        digest = hashlib.md5(full_path.read_bytes()).hexdigest()[:12]
+        cached = _static_hashes[path] = (mtime_ns, digest)
+    return f"/static/{path}?v={cached[1]}"
+
+
+class CachedStaticFiles(StaticFiles):
+    """
+    Fichiers statiques avec politique de cache :
+    - URL fingerprintée (?v=...) : cache longue durée, immuable
+    - sinon : revalidation systématique via ETag / Last-Modified
+    """
+
+    def file_response(self, full_path, stat_result, scope, status_code=200) -> Response:
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        query = parse_qs(scope.get("query_string", b"").decode())
+        response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL if "v" in query else "no-cache"
+        return response
+
+
+class SelectiveGZipMiddleware(GZipMiddleware):
+    """Compression gzip, sauf pour les chemins de flux (SSE) qui doivent être envoyés sans tampon"""
+
+    def __init__(self, app, minimum_size: int = 500, exclude_paths: tuple = ()):
+        super().__init__(app, minimum_size=minimum_size)
+        self.exclude_paths = exclude_paths
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] == "http" and scope["path"] in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
@@ -1,46 +1,72 @@
-from crontab import CronTab
-from croniter import croniter
 from datetime import datetime, timedelta
 import getpass
 import subprocess
 import os
 import sys
-import psutil
+import threading
 from pathlib import Path
 import logging
 import shlex
-from cron_descriptor import get_description, Options
 
+from events import broker
 from utils import add_log_file, Command, Name, Schedule, delete_log_file
 
 logger = logging.getLogger(__name__)
 
 _user = getpass.getuser()
 
-_cron = CronTab(user=_user)
+# Le crontab n'est lu (fork de "crontab -l") qu'au premier usage, voir get_cron()
+_cron = None
+# Protège le crontab partagé entre les requêtes et la synchronisation en tâche de fond
+_cron_lock = threading.RLock()
 
 
-def add_cron_job(comm: Command, name: Name, sched: Schedule, job_id: int) -> None:
-    if croniter.is_valid(sched):
-        job = _cron.new(command=add_log_file(comm, name, job_id), comment=name)
-        job.setall(sched)
-        _cron.write()
+def get_cron():
+    """Retourne le crontab de l'utilisateur, chargé au premier appel"""
+    global _cron
+    if _cron is None:
+        with _cron_lock:
+            if _cron is None:
+                from crontab import CronTab
+                _cron = CronTab(user=_user)
+    return _cron
+
+
+def is_valid_schedule(sched: Schedule) -> bool:
+    """Vérifie qu'une expression cron est valide"""
+    from croniter import croniter
+    return croniter.is_valid(sched)
+
+
+def add_cron_job(comm: Command, name: Name, sched: Schedule, job_id: int, upstreams: list = ()) -> None:
+    if is_valid_schedule(sched):
+        with _cron_lock:
+            cron = get_cron()
+            job = cron.new(command=add_log_file(comm, name, job_id, upstreams), comment=name)
+            job.setall(sched)
+            cron.write()
     else:
         raise ValueError("Invalid Cron Expression")
 
 
-def update_cron_job(comm: Command, name: Name, sched: Schedule, old_name: Name, job_id: int) -> None:
-    match = _cron.find_comment(old_name)
-    job = list(match)[0]
-    job.setall(sched)
-    job.set_command(add_log_file(comm, name, job_id))
-    job.set_comment(name)
-    _cron.write()
+def update_cron_job(
+    comm: Command, name: Name, sched: Schedule, old_name: Name, job_id: int, upstreams: list = ()
+) -> None:
+    with _cron_lock:
+        cron = get_cron()
+        match = cron.find_comment(old_name)
+        job = list(match)[0]
+        job.setall(sched)
+        job.set_command(add_log_file(comm, name, job_id, upstreams))
+        job.set_comment(name)
+        cron.write()
 
 
 def delete_cron_job(name: Name) -> None:
-    _cron.remove_all(comment=name)
-    _cron.write()
+    with _cron_lock:
+        cron = get_cron()
+        cron.remove_all(comment=name)
+        cron.write()
     delete_log_file(name)
 
 
@@ -56,38 +82,40 @@ def is_job_running(job_id: int) -> tuple[bool, int | None]:
     Returns:
         tuple: (is_running, pid) - True si le job tourne, False sinon, avec le PID ou None
     """
+    import psutil
+
     lock_file = get_lock_file_path(job_id)
     
-    logger.info(f"Checking lock file: {lock_file}, exists: {lock_file.exists()}")
+    logger.debug(f"Checking lock file: {lock_file}, exists: {lock_file.exists()}")
     
     if not lock_file.exists():
-        logger.info(f"No lock file for job {job_id}")
+        logger.debug(f"No lock file for job {job_id}")
         return False, None
     
     try:
         with open(lock_file, 'r') as f:
             pid = int(f.read().strip())
         
-        logger.info(f"Lock file contains PID: {pid}")
+        logger.debug(f"Lock file contains PID: {pid}")
         
         # Vérifier si le process existe toujours
         if psutil.pid_exists(pid):
-            logger.info(f"PID {pid} exists in system")
+            logger.debug(f"PID {pid} exists in system")
             try:
                 process = psutil.Process(pid)
                 status = process.status()
-                logger.info(f"Process {pid} status: {status}")
+                logger.debug(f"Process {pid} status: {status}")
                 # Vérifier que le process n'est pas un zombie
                 if status != psutil.STATUS_ZOMBIE:
-                    logger.info(f"Job {job_id} is running with PID {pid}")
+                    logger.debug(f"Job {job_id} is running with PID {pid}")
                     return True, pid
                 else:
                     logger.info(f"Process {pid} is zombie, cleaning lock")
             except (psutil.NoSuchProcess, psutil.AccessDenied) as e:
-                logger.info(f"Process check failed: {e}")
+                logger.debug(f"Process check failed: {e}")
                 pass
         else:
-            logger.info(f"PID {pid} does not exist")
+            logger.debug(f"PID {pid} does not exist")
         
         # Le process n'existe plus, nettoyer le lock
         lock_file.unlink()
@@ -127,6 +155,8 @@ def run_manually(name: Name, job_id: int, db_command: str) -> dict:
     Returns:
         dict: Informations sur le lancement (success, message, pid)
     """
+    import psutil
+
     # Vérifier si le job est déjà en cours d'exécution
     is_running, existing_pid = is_job_running(job_id)
     if is_running:
@@ -140,7 +170,7 @@ def run_manually(name: Name, job_id: int, db_command: str) -> dict:
     try:
         # Utiliser la commande originale (DB) avec logging, pas celle du crontab (qui a le wrapper)
         from utils import add_log_file
-        command = add_log_file(db_command, name, job_id=None)  # Sans wrapper cron
+        command = add_log_file(db_command, name, job_id=None, status_id=job_id)  # Sans wrapper cron
         
         logger.info(f"Launching job {job_id} ({name}) in background")
         logger.debug(f"Command to execute: {command}")
@@ -230,6 +260,7 @@ finally:
         
         # Ne pas attendre la fin du processus
         logger.info(f"Job {job_id} ({name}) launched successfully with PID {pid}")
+        broker.publish(job_id, running=True)
         
         return {
             "success": True,
@@ -255,9 +286,10 @@ finally:
 
 def get_next_schedule(name: Name) -> str:
     try:
-        match = _cron.find_comment(name)
-        job = list(match)[0]
-        schedule = job.schedule(date_from=datetime.now())
+        with _cron_lock:
+            match = get_cron().find_comment(name)
+            job = list(match)[0]
+            schedule = job.schedule(date_from=datetime.now())
         return schedule.get_next().strftime("%d/%m/%Y %H:%M:%S").replace("/", "-")
     except IndexError:
         return None
@@ -275,6 +307,8 @@ def get_cron_description(schedule: str, locale: str = "en") -> str:
         str: Description localisée ou expression brute en cas d'erreur
     """
     try:
+        from cron_descriptor import get_description, Options
+
         # cron-descriptor 2.x utilise Options() au lieu de locale_code
         # La locale est configurée via les Options
         options = Options()
@@ -290,25 +324,73 @@ def get_cron_description(schedule: str, locale: str = "en") -> str:
         return schedule  # Fallback sur l'expression brute
 
 
-def sync_job_to_cron(comm: Command, name: Name, sched: Schedule, job_id: int, is_active: bool = True) -> None:
-    """Synchronise un job de la DB vers le crontab système"""
-    # Vérifier si le job existe déjà dans le crontab
-    existing_jobs = list(_cron.find_comment(name))
-    
-    if existing_jobs:
+def get_upstreams(job) -> list:
+    """Jobs amont (id, nom) d'un job de la DB, pour les gardes de sa ligne crontab"""
+    return [(upstream.id, upstream.name) for upstream in job.upstreams]
+
+
+def _apply_job_to_cron(
+    cron, existing_job, comm: Command, name: Name, sched: Schedule, job_id: int, is_active: bool, upstreams: list = ()
+) -> None:
+    """Met à jour ou crée l'entrée crontab d'un job, sans écrire le crontab"""
+    if existing_job is not None:
         # Mettre à jour le job existant
-        job = existing_jobs[0]
-        job.setall(sched)
-        job.set_command(add_log_file(comm, name, job_id))
-        job.enable(is_active)  # Activer ou commenter le job
+        existing_job.setall(sched)
+        existing_job.set_command(add_log_file(comm, name, job_id, upstreams))
+        existing_job.enable(is_active)  # Activer ou commenter le job
     else:
         # Créer un nouveau job
-        if croniter.is_valid(sched):
-            job = _cron.new(command=add_log_file(comm, name, job_id), comment=name)
+        if is_valid_schedule(sched):
+            job = cron.new(command=add_log_file(comm, name, job_id, upstreams), comment=name)
             job.setall(sched)
             job.enable(is_active)  # Activer ou commenter le job
-    
-    _cron.write()
+
+
+def sync_job_to_cron(
+    comm: Command, name: Name, sched: Schedule, job_id: int, is_active: bool = True, upstreams: list = ()
+) -> None:
+    """Synchronise un job de la DB vers le crontab système"""
+    with _cron_lock:
+        cron = get_cron()
+        # Vérifier si le job existe déjà dans le crontab
+        existing_jobs = list(cron.find_comment(name))
+        _apply_job_to_cron(
+            cron, existing_jobs[0] if existing_jobs else None, comm, name, sched, job_id, is_active, upstreams
+        )
+        cron.write()
+
+
+def sync_jobs_to_cron(jobs: list) -> dict:
+    """
+    Synchronise plusieurs jobs de la DB vers le crontab système en une seule écriture.
+
+    Args:
+        jobs: Jobs de la DB (attributs command, name, schedule, id, is_active, upstreams)
+
+    Returns:
+        dict: Nombre de jobs synchronisés ("synced") et en erreur ("failed")
+    """
+    synced, failed = 0, 0
+    with _cron_lock:
+        cron = get_cron()
+        # Index des entrées existantes par commentaire : évite un parcours du crontab par job
+        existing = {}
+        for entry in cron:
+            existing.setdefault(entry.comment, entry)
+
+        for job in jobs:
+            try:
+                _apply_job_to_cron(
+                    cron, existing.get(job.name), job.command, job.name, job.schedule, job.id, job.is_active,
+                    get_upstreams(job),
+                )
+                synced += 1
+            except Exception as e:
+                failed += 1
+                logger.error(f"Error syncing job '{job.name}' to crontab: {e}")
+
+        cron.write()
+    return {"synced": synced, "failed": failed}
 
 
 def enable_cron_job(name: Name, enable: bool = True) -> bool:
@@ -323,10 +405,12 @@ def enable_cron_job(name: Name, enable: bool = True) -> bool:
         bool: True si l'opération a réussi, False sinon
     """
     try:
-        match = _cron.find_comment(name)
-        job = list(match)[0]
-        job.enable(enable)
-        _cron.write()
+        with _cron_lock:
+            cron = get_cron()
+            match = cron.find_comment(name)
+            job = list(match)[0]
+            job.enable(enable)
+            cron.write()
         logger.info(f"Job '{name}' {'enabled' if enable else 'disabled'} successfully")
         return True
     except IndexError:
@@ -348,8 +432,9 @@ def is_job_enabled(name: Name) -> bool:
         bool: True si le job est activé, False s'il est désactivé ou non trouvé
     """
     try:
-        match = _cron.find_comment(name)
-        job = list(match)[0]
-        return job.is_enabled()
+        with _cron_lock:
+            match = get_cron().find_comment(name)
+            job = list(match)[0]
+            return job.is_enabled()
     except IndexError:
         return False
@@ -1,20 +1,94 @@
-from sqlalchemy import create_engine
+import os
+from pathlib import Path
+from typing import List
+
+from sqlalchemy import create_engine, inspect
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from pydantic import BaseModel
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./jobs.db"
+BASE_DIR = Path(__file__).resolve().parent
+
+
+def normalize_database_url(url: str) -> str:
+    """Certains hébergeurs fournissent encore le schéma "postgres://", refusé par SQLAlchemy 1.4"""
+    if url.startswith("postgres://"):
+        return url.replace("postgres://", "postgresql://", 1)
+    return url
+
+
+# URL de la base configurable via l'environnement (SQLite par défaut)
+# ex: DATABASE_URL=postgresql://user:password@db:5432/crontab
+SQLALCHEMY_DATABASE_URL = normalize_database_url(os.environ.get("DATABASE_URL", "sqlite:///./jobs.db"))
+
+
+def get_engine_options(url: str) -> dict:
+    """
+    Retourne les options du moteur SQLAlchemy adaptées au backend.
+
+    Args:
+        url: URL de connexion à la base
+
+    Returns:
+        dict: Arguments à passer à create_engine
+    """
+    if url.startswith("sqlite"):
+        return {"connect_args": {"check_same_thread": False}}
+
+    # Backend serveur (PostgreSQL) : pool de connexions réglable
+    return {
+        "pool_size": int(os.environ.get("DB_POOL_SIZE", "5")),
+        "max_overflow": int(os.environ.get("DB_MAX_OVERFLOW", "10")),
+        "pool_timeout": int(os.environ.get("DB_POOL_TIMEOUT", "30")),
+        "pool_recycle": int(os.environ.get("DB_POOL_RECYCLE", "1800")),
+        "pool_pre_ping": True,
+    }
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
+
+engine = create_engine(SQLALCHEMY_DATABASE_URL, **get_engine_options(SQLALCHEMY_DATABASE_URL))
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
+# Révision correspondant au schéma historiquement créé par create_all
+INITIAL_REVISION = "0001"
+
+
+def run_migrations(bind=None) -> None:
+    """
+    Applique les migrations Alembic jusqu'à la dernière révision.
+
+    Args:
+        bind: Moteur SQLAlchemy à migrer (celui de l'application par défaut)
+    """
+    from alembic import command
+    from alembic.config import Config
+
+    bind = bind if bind is not None else engine
+
+    config = Config(str(BASE_DIR / "alembic.ini"))
+    config.set_main_option("script_location", str(BASE_DIR / "migrations"))
+    # ConfigParser interprète les "%" : il faut les doubler (mots de passe encodés)
+    config.set_main_option("sqlalchemy.url", bind.url.render_as_string(hide_password=False).replace("%", "%%"))
+    # Conserver la configuration du logging de l'application
+    config.attributes["configure_logger"] = False
+
+    with bind.begin() as connection:
+        # Connexion partagée avec migrations/env.py
+        config.attributes["connection"] = connection
+
+        tables = inspect(connection).get_table_names()
+        if "jobs" in tables and "alembic_version" not in tables:
+            # Base créée par une ancienne version (create_all) : on la marque comme
+            # étant à la révision initiale pour ne pas recréer la table
+            command.stamp(config, INITIAL_REVISION)
+
+        command.upgrade(config, "head")
+
 
 class JobRequest(BaseModel):
     command: str
     name: str
     schedule: str
+    depends_on: List[int] = []  # IDs des jobs amont
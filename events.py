@@ -0,0 +1,166 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Intervalle (secondes) de scrutation des logs et des locks par le watcher
+WATCH_INTERVAL = 2.0
+# Événements en attente par abonné avant de le considérer comme trop lent
+SUBSCRIBER_QUEUE_SIZE = 100
+# Marqueur déposé dans la file d'un abonné déconnecté par le broker
+CLOSE = None
+
+
+class EventBroker:
+    """
+    Diffuse l'état des jobs aux navigateurs abonnés (Server-Sent Events).
+
+    Seuls les champs modifiés depuis le dernier envoi sont publiés. Un unique
+    watcher, actif tant qu'il y a des abonnés, détecte les fins d'exécution et
+    les nouvelles lignes de log : le coût serveur ne dépend pas du nombre d'onglets.
+
+    Chaque nouvel abonné (y compris après une reconnexion) reçoit d'abord un
+    instantané de l'état connu, tiré de la mémoire du broker : aucun rendu de
+    page n'est nécessaire pour rattraper les événements manqués.
+    """
+
+    def __init__(self, interval: float = WATCH_INTERVAL):
+        self.interval = interval
+        self._subscribers = set()
+        self._states = {}
+        self._lock = threading.Lock()
+        self._loop = None
+        self._watcher = None
+        # Vrai dès qu'un passage du watcher a listé tous les jobs : l'instantané est alors complet
+        self._polled = False
+
+    def subscribe(self) -> asyncio.Queue:
+        """Enregistre un abonné, lui envoie l'instantané et démarre le watcher si nécessaire"""
+        self._loop = asyncio.get_event_loop()
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        queue.put_nowait(self.snapshot())
+        self._subscribers.add(queue)
+        if self._watcher is None or self._watcher.done():
+            self._watcher = self._loop.create_task(self._watch())
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        self._subscribers.discard(queue)
+
+    def snapshot(self) -> str:
+        """État connu de tous les jobs ("complete" : les jobs absents n'existent plus)"""
+        with self._lock:
+            jobs = {job_id: dict(state) for job_id, state in self._states.items()}
+        return json.dumps({"event": "snapshot", "complete": self._polled, "jobs": jobs})
+
+    def publish(self, job_id: int, **fields) -> None:
+        """
+        Publie les champs d'un job qui ont changé depuis le dernier envoi.
+        Peut être appelé depuis n'importe quel thread.
+        """
+        with self._lock:
+            state = self._states.setdefault(job_id, {})
+            was_running = state.get("running", False)
+            diff = {key: value for key, value in fields.items() if state.get(key, object()) != value}
+            state.update(diff)
+
+        if not diff:
+            return
+
+        if diff.get("running"):
+            event = "started"
+        elif "running" in diff and was_running:
+            event = "finished"
+        else:
+            event = "updated"
+        self._dispatch({"event": event, "job_id": job_id, **diff})
+
+    def publish_created(self, job_id: int, upstream_ids: list = ()) -> None:
+        """Nouveau job ; ses jobs amont deviennent racines de pipeline"""
+        with self._lock:
+            self._states.setdefault(job_id, {})
+        self._dispatch({"event": "created", "job_id": job_id, "upstreams": sorted(upstream_ids)})
+
+    def publish_deleted(self, job_id: int) -> None:
+        with self._lock:
+            self._states.pop(job_id, None)
+        self._dispatch({"event": "deleted", "job_id": job_id})
+
+    def _dispatch(self, payload: dict) -> None:
+        if self._loop is None or not self._subscribers:
+            return
+        data = json.dumps(payload)
+        try:
+            self._loop.call_soon_threadsafe(self._put, data)
+        except RuntimeError:
+            # Boucle fermée (arrêt du serveur)
+            pass
+
+    def _put(self, data: str) -> None:
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(data)
+            except asyncio.QueueFull:
+                # Abonné trop lent : on le déconnecte plutôt que d'accumuler. La file est
+                # vidée pour y déposer CLOSE, qui termine le flux : le navigateur se reconnecte
+                logger.warning("Dropping slow event subscriber")
+                self._subscribers.discard(queue)
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(CLOSE)
+
+    async def _watch(self) -> None:
+        """Scrute les jobs tant qu'il reste des abonnés"""
+        loop = asyncio.get_event_loop()
+        context = {"stamps": {}, "minute": None}
+        while self._subscribers:
+            try:
+                await loop.run_in_executor(None, self._poll, context)
+            except Exception as e:
+                logger.error(f"Error while watching jobs: {e}", exc_info=True)
+            await asyncio.sleep(self.interval)
+
+    def _poll(self, context: dict) -> None:
+        """Un passage du watcher : locks, logs et prochaine exécution de chaque job"""
+        from caching import get_job_names, get_log_stamp, get_status_stamp
+        from cronservice import get_lock_file_path, get_next_schedule, is_job_running
+        from database import SessionLocal
+        from utils import watch_status
+
+        db = SessionLocal()
+        try:
+            names = dict(get_job_names(db))
+        finally:
+            db.close()
+
+        minute = int(time.time() // 60)
+        stamps = context["stamps"]
+        for job_id, name in names.items():
+            # is_job_running n'est appelé que si un lock existe (cas rare)
+            fields = {"running": get_lock_file_path(job_id).exists() and is_job_running(job_id)[0]}
+
+            stamp = get_log_stamp(name), get_status_stamp(job_id)
+            log_changed = stamps.get(job_id) != stamp
+            if log_changed:
+                stamps[job_id] = stamp
+                fields["status"] = watch_status(name, job_id)
+                fields["log_size"] = stamp[0][1]
+            if log_changed or minute != context["minute"]:
+                fields["next_run"] = get_next_schedule(name)
+
+            self.publish(job_id, **fields)
+
+        for job_id in set(stamps) - set(names):
+            del stamps[job_id]
+        # Jobs supprimés (éventuellement par une autre instance)
+        with self._lock:
+            for job_id in set(self._states) - set(names):
+                del self._states[job_id]
+        context["minute"] = minute
+        self._polled = True
+
+
+broker = EventBroker()
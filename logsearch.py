@@ -0,0 +1,456 @@
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import threading
+from array import array
+from collections import deque
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from utils import LOG_DIR, get_log_path
+
+logger = logging.getLogger(__name__)
+
+# Écart maximal (secondes) entre deux lignes d'une même exécution
+RUN_GAP = 60
+# Taille (octets) d'un bloc indexé : la fin d'un fichier plus courte qu'un bloc est relue à chaque recherche
+BLOCK_SIZE = 1 << 16
+# Taille des lectures lors de l'indexation et des parcours linéaires
+READ_CHUNK_SIZE = 1 << 20
+# Octets en tête de fichier dont l'empreinte permet de détecter un fichier vidé puis réécrit
+HEAD_SIZE = 4096
+# Intervalle (secondes) de l'indexation en tâche de fond
+REFRESH_INTERVAL = 5.0
+# Longueur minimale d'une requête (un trigramme)
+MIN_QUERY_LENGTH = 3
+
+NAN = float("nan")
+
+# Préfixes ajoutés par "ts" (moreutils) et par le message "Skipped" de add_log_file
+_TS_DEFAULT = re.compile(rb"^([A-Z][a-z]{2}) +(\d{1,2}) (\d{2}):(\d{2}):(\d{2}) ")
+_TS_ISO = re.compile(rb"^(\d{4})-(\d{2})-(\d{2})[ T](\d{2}):(\d{2}):(\d{2})")
+# Les mêmes, découpés en minute / secondes pour la conversion rapide (_Clock)
+_TS_PREFIX = re.compile(rb"([A-Z][a-z]{2} +\d{1,2} \d{2}:\d{2}):(\d{2}) |(\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}):(\d{2})")
+_MONTHS = {
+    name: number
+    for number, name in enumerate(
+        [b"Jan", b"Feb", b"Mar", b"Apr", b"May", b"Jun", b"Jul", b"Aug", b"Sep", b"Oct", b"Nov", b"Dec"], start=1
+    )
+}
+
+
+def parse_timestamp(line: bytes, now: datetime) -> float | None:
+    """
+    Extrait l'horodatage en tête d'une ligne de log.
+    Le format par défaut de "ts" n'a pas d'année : on retient la plus récente
+    qui ne place pas la ligne dans le futur.
+
+    Returns:
+        float: Timestamp POSIX, ou None si la ligne n'est pas horodatée
+    """
+    match = _TS_DEFAULT.match(line)
+    if match:
+        month = _MONTHS.get(match.group(1))
+        if month is None:
+            return None
+        values = [int(group) for group in match.groups()[1:]]
+        try:
+            moment = datetime(now.year, month, *values)
+            if moment > now + timedelta(days=1):
+                moment = moment.replace(year=now.year - 1)
+            return moment.timestamp()
+        except ValueError:
+            return None
+
+    match = _TS_ISO.match(line)
+    if match:
+        try:
+            return datetime(*[int(group) for group in match.groups()]).timestamp()
+        except ValueError:
+            return None
+
+    return None
+
+
+class _Clock:
+    """Horodatage des lignes : parse_timestamp n'est appelé qu'une fois par minute distincte"""
+
+    def __init__(self, now: datetime):
+        self.now = now
+        self._minutes = {}
+
+    def __call__(self, line: bytes) -> float:
+        match = _TS_PREFIX.match(line)
+        if match is None:
+            return NAN
+        minute = match.group(1) or match.group(3)
+        base = self._minutes.get(minute)
+        if base is None:
+            base = parse_timestamp(minute + b":00 ", self.now)
+            base = self._minutes[minute] = NAN if base is None else base
+        return base + int(match.group(2) or match.group(4))
+
+
+def _advance(count: int, previous: float, run_start: float, timestamp: float) -> tuple:
+    """
+    Horodatage et début d'exécution d'une ligne, connaissant ceux de la précédente.
+    Une ligne sans horodatage hérite de celui de la ligne précédente.
+    """
+    if timestamp != timestamp:
+        timestamp = previous
+    if count == 0 or timestamp - previous > RUN_GAP or run_start != run_start:
+        run_start = timestamp
+    return timestamp, run_start
+
+
+def _tokens_trigrams(tokens) -> set:
+    """Trigrammes contenus dans des mots (les espaces ne sont jamais indexés)"""
+    trigrams = set()
+    for token in tokens:
+        trigrams.update([token[i:i + 3] for i in range(len(token) - 2)])
+    return trigrams
+
+
+def _read_lines(f, start: int, stop: int | None):
+    """Lit les lignes de [start, stop) (jusqu'à la fin du fichier si stop est None)"""
+    f.seek(start)
+    remaining = None if stop is None else stop - start
+    pending = b""
+    while remaining is None or remaining > 0:
+        chunk = f.read(READ_CHUNK_SIZE if remaining is None else min(READ_CHUNK_SIZE, remaining))
+        if not chunk:
+            break
+        if remaining is not None:
+            remaining -= len(chunk)
+        lines = (pending + chunk).split(b"\n")
+        pending = lines.pop()
+        yield from lines
+    if pending:
+        yield pending
+
+
+def _lines_before(f, start: int, count: int) -> list:
+    """Les `count` lignes qui précèdent la position start (dans la limite d'un bloc)"""
+    if count <= 0 or start == 0:
+        return []
+    position = max(start - BLOCK_SIZE, 0)
+    f.seek(position)
+    lines = f.read(start - position).split(b"\n")[:-1]
+    if position > 0:
+        # Première ligne tronquée
+        lines = lines[1:]
+    return lines[-count:]
+
+
+def _decode(line: bytes) -> str:
+    return line.decode(errors="replace")
+
+
+def _isoformat(timestamp: float) -> str | None:
+    if timestamp != timestamp:  # NaN : pas d'horodatage connu
+        return None
+    return datetime.fromtimestamp(timestamp).isoformat()
+
+
+class _FileIndex:
+    """
+    Index trigrammes d'un fichier de log, par blocs d'environ BLOCK_SIZE octets.
+
+    Chaque trigramme pointe vers les blocs qui le contiennent (array d'entiers) ;
+    chaque bloc conserve sa position, l'état d'exécution de sa première ligne et
+    ses horodatages extrêmes. La fin du fichier qui ne remplit pas encore un bloc
+    n'est pas indexée : elle est parcourue à chaque recherche.
+
+    Un seul thread (refresh) modifie l'index ; les recherches le lisent sans verrou
+    à partir de l'instantané `end`, remplacé une fois chaque bloc ajouté.
+    """
+
+    def __init__(self, path: Path, inode: int):
+        self.path = path
+        self.inode = inode
+        # Empreinte des HEAD_SIZE premiers octets, connue dès le premier bloc
+        self.head = None
+        # Par bloc : position, numéro, horodatage précédent et début d'exécution de sa première ligne
+        self.starts = array("Q")
+        self.first_lines = array("Q")
+        self.previous = array("d")
+        self.run_starts = array("d")
+        # Par bloc : horodatages extrêmes (filtres since / until)
+        self.min_timestamps = array("d")
+        self.max_timestamps = array("d")
+        # Trigramme (minuscules) -> numéros des blocs croissants
+        self.postings = {}
+        # Instantané : (blocs indexés, fin du dernier bloc, état après sa dernière ligne)
+        self.end = (0, 0, (0, NAN, NAN))
+
+    def matches(self, f, stat_result: os.stat_result) -> bool:
+        """Vérifie que le fichier ouvert prolonge le contenu indexé (ni remplacé, ni vidé puis réécrit)"""
+        count, offset, _ = self.end
+        if stat_result.st_ino != self.inode or stat_result.st_size < offset:
+            return False
+        if count == 0:
+            return True
+        f.seek(0)
+        if hashlib.md5(f.read(HEAD_SIZE)).digest() != self.head:
+            return False
+        f.seek(offset - 1)
+        return f.read(1) == b"\n"
+
+    def update(self, f, size: int) -> None:
+        """Indexe les blocs complets ajoutés depuis le dernier appel, dans la limite de size"""
+        count, offset, state = self.end
+        clock = _Clock(datetime.now())
+        f.seek(offset)
+        buffer = b""
+        position = offset
+        while position < size:
+            chunk = f.read(min(READ_CHUNK_SIZE, size - position))
+            if not chunk:
+                break
+            position += len(chunk)
+            buffer += chunk
+
+            cut = 0
+            while len(buffer) - cut >= BLOCK_SIZE:
+                newline = buffer.rfind(b"\n", cut, cut + BLOCK_SIZE)
+                if newline < 0:
+                    # Ligne plus longue qu'un bloc
+                    newline = buffer.find(b"\n", cut + BLOCK_SIZE)
+                    if newline < 0:
+                        break
+                state = self._add_block(count, offset, buffer[cut:newline + 1], state, clock)
+                count += 1
+                offset += newline + 1 - cut
+                cut = newline + 1
+                self.end = (count, offset, state)
+            buffer = buffer[cut:]
+
+    def _add_block(self, number: int, start: int, data: bytes, state: tuple, clock: _Clock) -> tuple:
+        if number == 0:
+            self.head = hashlib.md5(data[:HEAD_SIZE]).digest()
+
+        lines = data.split(b"\n")
+        lines.pop()
+        count, previous, run_start = state
+        self.starts.append(start)
+        self.first_lines.append(count)
+        self.previous.append(previous)
+        self.run_starts.append(run_start)
+
+        low = high = NAN
+        for line in lines:
+            previous, run_start = _advance(count, previous, run_start, clock(line))
+            count += 1
+            if previous == previous:
+                if not low <= previous:
+                    low = previous
+                if not high >= previous:
+                    high = previous
+        self.min_timestamps.append(low)
+        self.max_timestamps.append(high)
+
+        for trigram in _tokens_trigrams(set(data.lower().split())):
+            postings = self.postings.get(trigram)
+            if postings is None:
+                self.postings[trigram] = array("I", [number])
+            else:
+                postings.append(number)
+
+        return count, previous, run_start
+
+    def candidates(self, trigrams: set, count: int) -> list:
+        """Numéros des blocs (parmi les `count` premiers) contenant tous les trigrammes"""
+        if not trigrams:
+            return list(range(count))
+
+        postings = []
+        for trigram in trigrams:
+            blocks = self.postings.get(trigram)
+            if blocks is None:
+                return []
+            postings.append(blocks)
+
+        # Intersection en partant de la liste la plus courte
+        postings.sort(key=len)
+        result = set(postings[0])
+        for blocks in postings[1:]:
+            result.intersection_update(blocks)
+            if not result:
+                return []
+        return sorted(block for block in result if block < count)
+
+    def search(self, f, needle: bytes, trigrams: set, since_ts, until_ts, context: int):
+        """Parcourt les blocs candidats puis la fin non indexée du fichier ouvert f"""
+        count, offset, state = self.end
+        blocks = self.candidates(trigrams, count)
+        if since_ts is not None:
+            blocks = [block for block in blocks if self.max_timestamps[block] >= since_ts]
+        if until_ts is not None:
+            blocks = [block for block in blocks if self.min_timestamps[block] <= until_ts]
+
+        # Blocs consécutifs parcourus d'un seul tenant
+        index = 0
+        while index < len(blocks):
+            first = last = blocks[index]
+            while index + 1 < len(blocks) and blocks[index + 1] == last + 1:
+                index += 1
+                last += 1
+            index += 1
+            stop = self.starts[last + 1] if last + 1 < count else offset
+            block_state = (self.first_lines[first], self.previous[first], self.run_starts[first])
+            yield from self._scan(f, self.starts[first], stop, block_state, needle, since_ts, until_ts, context)
+
+        yield from self._scan(f, offset, None, state, needle, since_ts, until_ts, context)
+
+    def _scan(self, f, start: int, stop: int | None, state: tuple, needle: bytes, since_ts, until_ts, context: int):
+        """Parcours linéaire de [start, stop) : une vérification exacte par ligne"""
+        clock = _Clock(datetime.now())
+        before = deque(_lines_before(f, start, context), maxlen=max(context, 1))
+        pending = deque()
+        count, previous, run_start = state
+
+        for line in _read_lines(f, start, stop):
+            for match in pending:
+                match["after"].append(_decode(line))
+            while pending and len(pending[0]["after"]) >= context:
+                yield pending.popleft()
+
+            previous, run_start = _advance(count, previous, run_start, clock(line))
+            count += 1
+            if (
+                needle in line.lower()
+                and (since_ts is None or previous >= since_ts)
+                and (until_ts is None or previous <= until_ts)
+            ):
+                match = {
+                    "file": self.path.stem,
+                    "line_number": count,
+                    "timestamp": _isoformat(previous),
+                    "run_started": _isoformat(run_start),
+                    "line": _decode(line),
+                    "before": [_decode(text) for text in before] if context else [],
+                    "after": [],
+                }
+                if context:
+                    pending.append(match)
+                else:
+                    yield match
+            before.append(line)
+
+        if pending and stop is not None:
+            # Contexte après la plage, lu dans la suite du fichier
+            for line in _read_lines(f, stop, None):
+                for match in pending:
+                    match["after"].append(_decode(line))
+                while pending and len(pending[0]["after"]) >= context:
+                    yield pending.popleft()
+                if not pending:
+                    break
+        yield from pending
+
+
+class LogIndex:
+    """
+    Index de recherche sur tous les fichiers de log.
+
+    L'index est alimenté en tâche de fond (watch) : seuls les blocs ajoutés
+    depuis le passage précédent sont indexés. Une recherche n'attend jamais
+    l'indexation : ce qui n'est pas encore indexé est parcouru linéairement.
+    Un fichier vidé (clear_logs) ou remplacé est réindexé entièrement.
+    """
+
+    def __init__(self, log_dir: Path = LOG_DIR):
+        self.log_dir = Path(log_dir)
+        self._files = {}
+        # Un seul rafraîchissement à la fois ; les recherches ne le prennent pas
+        self._lock = threading.Lock()
+
+    def refresh(self) -> None:
+        """Met l'index à jour avec le contenu actuel du répertoire des logs"""
+        with self._lock:
+            seen = set()
+            for path in self.log_dir.glob("*.log"):
+                try:
+                    with open(path, "rb") as f:
+                        stat_result = os.fstat(f.fileno())
+                        index = self._files.get(path)
+                        if index is None or not index.matches(f, stat_result):
+                            if index is not None:
+                                logger.debug(f"Log file {path} was replaced or truncated, reindexing")
+                            index = self._files[path] = _FileIndex(path, stat_result.st_ino)
+                        index.update(f, stat_result.st_size)
+                except FileNotFoundError:
+                    continue
+                seen.add(path)
+
+            for path in set(self._files) - seen:
+                self._files.pop(path, None)
+
+    def forget(self, name: str) -> None:
+        """Oublie l'index du log d'un job (logs vidés ou job supprimé)"""
+        self._files.pop(self.log_dir / get_log_path(name).name, None)
+
+    async def watch(self, interval: float = REFRESH_INTERVAL) -> None:
+        """Indexe en tâche de fond les lignes ajoutées aux logs"""
+        loop = asyncio.get_event_loop()
+        while True:
+            try:
+                await loop.run_in_executor(None, self.refresh)
+            except Exception as e:
+                logger.error(f"Error while indexing logs: {e}", exc_info=True)
+            await asyncio.sleep(interval)
+
+    def search(
+        self,
+        query: str,
+        since: datetime = None,
+        until: datetime = None,
+        files: set = None,
+        context: int = 0,
+        limit: int = 100,
+    ):
+        """
+        Recherche une chaîne (insensible à la casse) dans les logs.
+        Chaque fichier n'est ouvert qu'une fois par recherche.
+
+        Args:
+            query: Texte recherché
+            since: Ignorer les lignes antérieures
+            until: Ignorer les lignes postérieures
+            files: Noms de fichiers (sans .log) à parcourir, tous si None
+            context: Nombre de lignes de contexte avant et après (dans la limite d'un bloc avant)
+            limit: Nombre maximal de résultats
+
+        Yields:
+            dict: file, line_number, timestamp, run_started, line, before, after
+        """
+        if limit <= 0:
+            return
+        needle = query.encode().lower()
+        trigrams = _tokens_trigrams(needle.split())
+        since_ts = since.timestamp() if since else None
+        until_ts = until.timestamp() if until else None
+
+        found = 0
+        for path in sorted(self.log_dir.glob("*.log")):
+            if files is not None and path.stem not in files:
+                continue
+            try:
+                f = open(path, "rb")
+            except FileNotFoundError:
+                continue
+            with f:
+                index = self._files.get(path)
+                if index is None or not index.matches(f, os.fstat(f.fileno())):
+                    # Pas encore indexé, ou périmé : parcours linéaire du fichier
+                    index = _FileIndex(path, 0)
+                for match in index.search(f, needle, trigrams, since_ts, until_ts, context):
+                    yield match
+                    found += 1
+                    if found >= limit:
+                        return
+
+
+log_index = LogIndex()
@@ -1,16 +1,43 @@
-from fastapi import FastAPI, Request, Depends, HTTPException
-from fastapi.staticfiles import StaticFiles
+from fastapi import FastAPI, Request, Depends, HTTPException, Query
 from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy.orm import Session, selectinload
+from datetime import datetime
+import asyncio
+import json
 import logging
+import time
 
-import models
 import cronservice
-from models import Job
-from utils import clear_logs, load_logs, get_locale_from_accept_language, watch_status
-from database import SessionLocal, engine, JobRequest
+from caching import (
+    CachedStaticFiles,
+    SelectiveGZipMiddleware,
+    bump_job_table_version,
+    cache_headers,
+    compute_etag,
+    compute_last_modified,
+    get_job_names,
+    get_job_table_version,
+    get_log_stamp,
+    is_not_modified,
+    not_modified_response,
+    static_url,
+)
+from models import Job, job_dependencies
+from utils import clear_logs, get_log_path, load_logs_from, get_locale_from_accept_language, watch_status
+from database import SessionLocal, JobRequest, run_migrations
+from events import CLOSE, broker
+from logsearch import MIN_QUERY_LENGTH, log_index
+from pipeline import (
+    check_dependencies,
+    get_pipeline,
+    load_dependency_graph,
+    pipeline_levels,
+    resolve_pipeline,
+    start_pipeline,
+    watch_scheduled_runs,
+)
 
 # Configuration du logging
 logging.basicConfig(level=logging.INFO)
@@ -27,9 +54,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-app.mount("/static", StaticFiles(directory="static"), name="static")
-models.Base.metadata.create_all(bind=engine)
+# Compression des réponses HTML, JSON et logs (les flux /events et /search_logs/ ne sont pas compressés)
+app.add_middleware(SelectiveGZipMiddleware, minimum_size=1000, exclude_paths=("/events", "/search_logs/"))
+
+app.mount("/static", CachedStaticFiles(directory="static"), name="static")
 templates = Jinja2Templates(directory="templates")
+templates.env.globals["static_url"] = static_url
 
 
 def get_db():
@@ -40,74 +70,182 @@ def get_db():
         db.close()
 
 
-@app.on_event("startup")
-async def startup_event():
-    """Synchronise la base de données avec le crontab système au démarrage"""
-    logger.info("🚀 Application démarrée - Synchronisation des jobs cron...")
-    
+# État de la synchronisation initiale DB -> crontab, exposé par /ready
+_startup_state = {"ready": False, "synced": 0, "failed": 0, "error": None}
+
+
+def sync_all_jobs() -> None:
+    """Synchronise tous les jobs de la base avec le crontab système"""
     db = SessionLocal()
     try:
         # Récupérer tous les jobs de la base de données
-        jobs = db.query(Job).all()
+        jobs = db.query(Job).options(selectinload(Job.upstreams)).all()
         
         if jobs:
             logger.info(f"📋 Synchronisation de {len(jobs)} job(s) avec le crontab système...")
-            
-            for job in jobs:
-                try:
-                    cronservice.sync_job_to_cron(job.command, job.name, job.schedule, job.id, job.is_active)
-                    status = "✅" if job.is_active else "⏸️ (désactivé)"
-                    logger.info(f"  {status} Job '{job.name}' synchronisé")
-                except Exception as e:
-                    logger.error(f"  ❌ Erreur lors de la synchronisation du job '{job.name}': {e}")
-            
-            logger.info("✅ Synchronisation terminée avec succès")
+            result = cronservice.sync_jobs_to_cron(jobs)
+            _startup_state.update(result)
+            logger.info(f"✅ Synchronisation terminée : {result['synced']} job(s) synchronisé(s), {result['failed']} en erreur")
         else:
             logger.info("ℹ️  Aucun job à synchroniser")
+        
+        # Prêt uniquement si la synchronisation a abouti
+        _startup_state["ready"] = True
             
     except Exception as e:
+        _startup_state["error"] = str(e)
         logger.error(f"❌ Erreur lors de la synchronisation au démarrage: {e}")
     finally:
         db.close()
 
 
+@app.on_event("startup")
+async def startup_event():
+    """Migre la base puis synchronise les jobs avec le crontab en tâche de fond"""
+    logger.info("🚀 Application démarrée - Migration du schéma de la base...")
+    run_migrations()
+
+    # La synchronisation (lecture du crontab, écriture) ne bloque pas le démarrage du serveur
+    logger.info("🔄 Synchronisation des jobs cron en arrière-plan...")
+    asyncio.get_event_loop().run_in_executor(None, sync_all_jobs)
+
+    # Indexation des logs en tâche de fond : les recherches ne l'attendent jamais
+    asyncio.get_event_loop().create_task(log_index.watch())
+
+    # Les exécutions cron réussies lancent leurs jobs aval
+    asyncio.get_event_loop().create_task(watch_scheduled_runs())
+
+
+@app.get("/ready")
+async def ready():
+    """
+    Indique si la synchronisation initiale avec le crontab est terminée.
+    Retourne 503 tant qu'elle est en cours, ou si elle a échoué (champ "error").
+    """
+    return JSONResponse(content=_startup_state, status_code=200 if _startup_state["ready"] else 503)
+
+
+@app.get("/events")
+async def job_events(request: Request):
+    """
+    Flux Server-Sent Events des changements d'état des jobs.
+    Chaque message ne contient que les champs modifiés (running, status, next_run, is_active...).
+    """
+    queue = broker.subscribe()
+
+    async def event_stream():
+        try:
+            while not await request.is_disconnected():
+                try:
+                    data = await asyncio.wait_for(queue.get(), timeout=15)
+                    if data is CLOSE:
+                        # Abonné déconnecté (trop lent) : EventSource se reconnectera
+                        break
+                    yield f"data: {data}\n\n"
+                except asyncio.TimeoutError:
+                    # Commentaire SSE : garde la connexion ouverte à travers les proxies
+                    yield ": keep-alive\n\n"
+        finally:
+            broker.unsubscribe(queue)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 def update_displayed_schedule(db: Session = Depends(get_db)) -> None:
     jobs = db.query(Job).all()
     for job in jobs:
         job.next_run = cronservice.get_next_schedule(job.name)
-        job.status = watch_status(job.name)
+        job.status = watch_status(job.name, job.id)
+
+
+def get_log_validators(kind: str, job_id: int, db: Session) -> tuple[str, float]:
+    """ETag et Last-Modified des logs d'un job, calculés sans lire le fichier"""
+    version, table_modified = get_job_table_version(db)
+    name = get_job_names(db, version).get(job_id)
+    log_stamp = get_log_stamp(name) if name is not None else (0, 0)
+    return compute_etag(version, kind, job_id, log_stamp), compute_last_modified(table_modified, log_stamp[0])
 
 
 @app.get("/")
 async def home(request: Request, db: Session = Depends(get_db)):
-    update_displayed_schedule(db)
-    jobs = db.query(Job).all()
-    
     # Extraire la locale depuis Accept-Language
     accept_language = request.headers.get("Accept-Language", "en")
     locale = get_locale_from_accept_language(accept_language)
     
+    # Validation HTTP : version de la table, état des logs (Status) et minute courante (Next Run)
+    version, table_modified = get_job_table_version(db)
+    log_stamps = tuple((job_id, get_log_stamp(name)) for job_id, name in sorted(get_job_names(db, version).items()))
+    minute = int(time.time() // 60)
+    etag = compute_etag(version, "home", locale, minute, log_stamps)
+    last_modified = compute_last_modified(table_modified, minute * 60 * 10**9, *(stamp[0] for _, stamp in log_stamps))
+    headers = {"Vary": "Accept-Language"}
+    if is_not_modified(request, etag, last_modified):
+        return not_modified_response(etag, last_modified, headers)
+    
+    update_displayed_schedule(db)
+    jobs = db.query(Job).all()
+    
     # Enrichir chaque job avec sa description cron localisée
     for job in jobs:
         job.cron_description = cronservice.get_cron_description(job.schedule, locale)
     
-    output = {"request": request, "jobs": jobs}
-    return templates.TemplateResponse("home.html", output)
+    # Jobs ayant des descendants : ils peuvent lancer un pipeline
+    pipeline_roots = {upstream_id for upstream_id, in db.query(job_dependencies.c.upstream_id).distinct()}
+    
+    output = {"request": request, "jobs": jobs, "pipeline_roots": pipeline_roots}
+    return templates.TemplateResponse("home.html", output, headers={**cache_headers(etag, last_modified), **headers})
+
+
+@app.get("/jobs/{job_id}/row")
+async def get_job_row(job_id: int, request: Request, db: Session = Depends(get_db)):
+    """
+    Ligne du tableau d'un seul job : le tableau de bord l'insère quand un job
+    est créé, sans recharger la page entière.
+    """
+    job = db.query(Job).filter(Job.id == job_id).first()
+    
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    locale = get_locale_from_accept_language(request.headers.get("Accept-Language", "en"))
+    job.next_run = cronservice.get_next_schedule(job.name)
+    job.status = watch_status(job.name, job.id)
+    job.cron_description = cronservice.get_cron_description(job.schedule, locale)
+    pipeline_roots = {job.id} if job.downstreams else set()
+    
+    output = {"request": request, "job": job, "pipeline_roots": pipeline_roots}
+    return templates.TemplateResponse("job_row.html", output, headers={"Cache-Control": "no-cache"})
 
 
 @app.get("/jobs/{job_id}")
 async def get_jobs(job_id: int, request: Request, db: Session = Depends(get_db)):
+    version, table_modified = get_job_table_version(db)
+    etag, last_modified = compute_etag(version, "job", job_id), compute_last_modified(table_modified)
+    if is_not_modified(request, etag, last_modified):
+        return not_modified_response(etag, last_modified)
+    
     job_update = db.query(Job).filter(Job.id == job_id).first()
     output = {"request": request, "job_update": job_update}
-    return templates.TemplateResponse("jobs.html", output)
+    return templates.TemplateResponse("jobs.html", output, headers=cache_headers(etag, last_modified))
 
 
 @app.get("/logs/{job_id}")
 async def get_logs(job_id: int, request: Request, db: Session = Depends(get_db)):
+    etag, last_modified = get_log_validators("logs", job_id, db)
+    if is_not_modified(request, etag, last_modified):
+        return not_modified_response(etag, last_modified)
+    
     job = db.query(Job).filter(Job.id == job_id).first()
-    log_content = load_logs(job.name)
-    output = {"request": request, "job": job, "log_content": log_content}
-    return templates.TemplateResponse("logs.html", output)
+    log_content, log_size, _ = load_logs_from(job.name)
+    if not get_log_path(job.name).exists():
+        log_content = "No log yet"
+    # La page ne récupère ensuite que les lignes ajoutées après log_size
+    output = {"request": request, "job": job, "log_content": log_content, "log_size": log_size}
+    return templates.TemplateResponse("logs.html", output, headers=cache_headers(etag, last_modified))
 
 
 @app.post("/clear_logs/{job_id}/")
@@ -125,6 +263,7 @@ async def clear_job_logs(job_id: int, db: Session = Depends(get_db)):
             raise HTTPException(status_code=404, detail="Job not found")
         
         clear_logs(job.name)
+        log_index.forget(job.name)
         logger.info(f"Logs cleared successfully for job {job_id}: {job.name}")
         
         return JSONResponse(
@@ -140,46 +279,127 @@ async def clear_job_logs(job_id: int, db: Session = Depends(get_db)):
 
 
 @app.get("/refresh_logs/{job_id}/")
-async def refresh_job_logs(job_id: int, db: Session = Depends(get_db)):
+async def refresh_job_logs(job_id: int, request: Request, offset: int = Query(0, ge=0), db: Session = Depends(get_db)):
     """
-    Récupère le contenu actuel des logs d'un job.
+    Récupère les lignes ajoutées aux logs d'un job après offset (octets).
+    "reset" indique que le log a été vidé : le contenu renvoyé remplace l'affichage.
+    Retourne 304 si les logs n'ont pas changé depuis le dernier appel.
     """
     try:
+        etag, last_modified = get_log_validators(f"refresh_logs:{offset}", job_id, db)
+        if is_not_modified(request, etag, last_modified):
+            return not_modified_response(etag, last_modified)
+        
         job = db.query(Job).filter(Job.id == job_id).first()
         
         if not job:
             raise HTTPException(status_code=404, detail="Job not found")
         
-        log_content = load_logs(job.name)
+        log_content, log_size, reset = load_logs_from(job.name, offset)
         
         return JSONResponse(
             content={
                 "success": True,
-                "log_content": log_content
+                "log_content": log_content,
+                "log_size": log_size,
+                "reset": reset
             },
-            status_code=200
+            status_code=200,
+            headers=cache_headers(etag, last_modified)
         )
     except Exception as e:
         logger.error(f"Error refreshing logs for job {job_id}: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 
+@app.get("/search_logs/")
+async def search_logs(
+    q: str,
+    since: datetime = None,
+    until: datetime = None,
+    job_id: int = None,
+    context: int = Query(2, ge=0, le=20),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+):
+    """
+    Recherche un texte dans les logs de tous les jobs (ou d'un seul avec job_id).
+    Les résultats sont envoyés au fil de l'eau, un objet JSON par ligne (NDJSON),
+    avec le job, la ligne, son horodatage, le début de l'exécution et le contexte.
+    """
+    if len(q) < MIN_QUERY_LENGTH:
+        raise HTTPException(status_code=400, detail=f"Search query must be at least {MIN_QUERY_LENGTH} characters")
+    
+    job_names = get_job_names(db)
+    # Fichier de log (nom sans espaces) -> job
+    jobs_by_file = {name.replace(" ", ""): (id_, name) for id_, name in job_names.items()}
+    if job_id is not None:
+        if job_id not in job_names:
+            raise HTTPException(status_code=404, detail="Job not found")
+        files = {job_names[job_id].replace(" ", "")}
+    else:
+        files = None
+    
+    def results():
+        for match in log_index.search(q, since=since, until=until, files=files, context=context, limit=limit):
+            match_job_id, match_job_name = jobs_by_file.get(match["file"], (None, match["file"]))
+            yield json.dumps({"job_id": match_job_id, "job_name": match_job_name, **match}) + "\n"
+    
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+
+def get_upstream_jobs(db: Session, job_id: int | None, upstream_ids: list) -> list:
+    """
+    Charge les jobs amont d'un job après vérification (existence, absence de cycle).
+    Lève une HTTPException 400/404 si les dépendances sont invalides.
+    """
+    upstream_ids = set(upstream_ids)
+    upstreams = db.query(Job).filter(Job.id.in_(upstream_ids)).all() if upstream_ids else []
+    if len(upstreams) != len(upstream_ids):
+        raise HTTPException(status_code=404, detail="Upstream job not found")
+    
+    if job_id is not None:
+        try:
+            check_dependencies(load_dependency_graph(db), job_id, upstream_ids)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    return upstreams
+
+
+def sync_downstream_jobs(downstreams: list) -> None:
+    """Réécrit les lignes crontab des jobs aval, dont les gardes nomment leurs jobs amont"""
+    for downstream in downstreams:
+        cronservice.sync_job_to_cron(
+            downstream.command,
+            downstream.name,
+            downstream.schedule,
+            downstream.id,
+            downstream.is_active,
+            cronservice.get_upstreams(downstream)
+        )
+
+
 @app.post("/create_job/")
 async def create_job(job_request: JobRequest, db: Session = Depends(get_db)):
     job = Job()
     job.command = job_request.command
     job.name = job_request.name
     job.schedule = job_request.schedule
+    # Nouveau job : il n'a pas encore de descendant, aucun cycle possible
+    job.upstreams = get_upstream_jobs(db, None, job_request.depends_on)
     try:
         # D'abord ajouter à la DB pour obtenir l'ID
         db.add(job)
+        bump_job_table_version(db)
         db.commit()
         db.refresh(job)  # Récupérer l'ID généré
         
         # Ensuite ajouter au crontab avec l'ID
-        cronservice.add_cron_job(job.command, job.name, job.schedule, job.id)
+        cronservice.add_cron_job(job.command, job.name, job.schedule, job.id, cronservice.get_upstreams(job))
         job.next_run = cronservice.get_next_schedule(job.name)
+        bump_job_table_version(db)
         db.commit()
+        broker.publish_created(job.id, [upstream.id for upstream in job.upstreams])
     except ValueError:
         db.rollback()
         raise HTTPException(status_code=404, detail="Invalid Cron Expression")
@@ -192,17 +412,26 @@ async def update_job(
 ):
     existing_job = db.query(Job).filter(Job.id == job_id)
     old_name = existing_job.first().name
+    upstreams = get_upstream_jobs(db, job_id, job_request.depends_on)
     
     cronservice.update_cron_job(
         job_request.command,
         job_request.name,
         job_request.schedule,
         old_name,
-        job_id
+        job_id,
+        [(upstream.id, upstream.name) for upstream in upstreams]
     )
-    existing_job.update(job_request.__dict__)
-    existing_job.update({"next_run": cronservice.get_next_schedule(job_request.name)})
+    existing_job.update(job_request.dict(exclude={"depends_on"}))
+    next_run = cronservice.get_next_schedule(job_request.name)
+    existing_job.update({"next_run": next_run})
+    existing_job.first().upstreams = upstreams
+    bump_job_table_version(db)
     db.commit()
+    if job_request.name != old_name:
+        # Les lignes crontab des jobs aval lisent le log de ce job sous son ancien nom
+        sync_downstream_jobs(existing_job.first().downstreams)
+    broker.publish(job_id, next_run=next_run)
     return {"msg": "Successfully updated data."}
 
 
@@ -251,16 +480,84 @@ async def run_job(job_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 
+@app.get("/run_pipeline/{job_id}/")
+async def run_job_pipeline(job_id: int, db: Session = Depends(get_db)):
+    """
+    Lance un job puis, en chaîne, tous les jobs qui en dépendent.
+    Le DAG est résolu avant le lancement : chaque job démarre dès que ses jobs
+    amont ont réussi, les branches indépendantes s'exécutent en parallèle.
+    """
+    try:
+        root = db.query(Job).filter(Job.id == job_id).first()
+        
+        if not root:
+            raise HTTPException(status_code=404, detail="Job not found")
+        
+        plan = resolve_pipeline(load_dependency_graph(db), job_id)
+        try:
+            levels = pipeline_levels(plan)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        jobs = {job.id: (job.name, job.command, job.is_active) for job in db.query(Job).filter(Job.id.in_(plan))}
+        try:
+            start_pipeline(job_id, plan, jobs)
+        except RuntimeError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        
+        logger.info(f"Pipeline started from job {job_id} ({root.name}): {levels}")
+        
+        return JSONResponse(
+            content={
+                "success": True,
+                "message": f"Pipeline lancé ({len(plan)} job(s))",
+                "levels": levels
+            },
+            status_code=200
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Unexpected error in run_pipeline endpoint for job {job_id}: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
+@app.get("/pipeline/{job_id}/")
+async def get_pipeline_status(job_id: int):
+    """
+    Retourne l'état du dernier pipeline lancé depuis un job
+    (pending, running, success, failed ou skipped pour chaque job).
+    """
+    run = get_pipeline(job_id)
+    
+    if run is None:
+        raise HTTPException(status_code=404, detail="No pipeline for this job")
+    
+    return JSONResponse(
+        content={
+            "running": run.is_running(),
+            "states": run.states
+        },
+        status_code=200
+    )
+
+
 @app.delete("/job/{job_id}/")
 async def delete_job(job_id: int, db: Session = Depends(get_db)):
     job_update = db.query(Job).filter(Job.id == job_id).first()
+    downstreams = list(job_update.downstreams)
     cronservice.delete_cron_job(job_update.name)
     
     # Nettoyer le lock si le job était en cours d'exécution
     cronservice.release_lock(job_id)
     
     db.delete(job_update)
+    bump_job_table_version(db)
     db.commit()
+    log_index.forget(job_update.name)
+    # Les jobs aval ne dépendent plus de ce job
+    sync_downstream_jobs(downstreams)
+    broker.publish_deleted(job_id)
     return {"INFO": f"Deleted {job_id} Successfully"}
 
 
@@ -287,8 +584,12 @@ async def toggle_job(job_id: int, db: Session = Depends(get_db)):
         
         # Update in database
         job.is_active = new_state
+        bump_job_table_version(db)
         db.commit()
         
+        next_run = cronservice.get_next_schedule(job.name)
+        broker.publish(job_id, is_active=new_state, next_run=next_run)
+        
         status_text = "enabled" if new_state else "disabled"
         logger.info(f"Job {job_id} ({job.name}) {status_text}")
         
@@ -296,6 +597,7 @@ async def toggle_job(job_id: int, db: Session = Depends(get_db)):
             content={
                 "success": True,
                 "is_active": new_state,
+                "next_run": next_run,
                 "message": f"Job {status_text} successfully"
             },
             status_code=200
@@ -0,0 +1,31 @@
+"""add job dependencies
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "job_dependencies",
+        sa.Column("job_id", sa.Integer(), nullable=False),
+        sa.Column("upstream_id", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["job_id"], ["jobs.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["upstream_id"], ["jobs.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("job_id", "upstream_id"),
+    )
+    op.create_index(op.f("ix_job_dependencies_upstream_id"), "job_dependencies", ["upstream_id"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_job_dependencies_upstream_id"), table_name="job_dependencies")
+    op.drop_table("job_dependencies")
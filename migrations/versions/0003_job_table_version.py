@@ -0,0 +1,31 @@
+"""add job table version counter
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19
+"""
+import time
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    table = op.create_table(
+        "job_table_version",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("version", sa.Integer(), nullable=False),
+        sa.Column("updated_at", sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.bulk_insert(table, [{"id": 1, "version": 0, "updated_at": time.time()}])
+
+
+def downgrade() -> None:
+    op.drop_table("job_table_version")
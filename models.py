@@ -1,8 +1,18 @@
-from sqlalchemy import Boolean, Column, Integer, String
+from sqlalchemy import Boolean, Column, Float, ForeignKey, Integer, String, Table
+from sqlalchemy.orm import relationship
 
 from database import Base
 
 
+# Dépendances entre jobs : job_id démarre après la réussite de upstream_id
+job_dependencies = Table(
+    "job_dependencies",
+    Base.metadata,
+    Column("job_id", Integer, ForeignKey("jobs.id", ondelete="CASCADE"), primary_key=True),
+    Column("upstream_id", Integer, ForeignKey("jobs.id", ondelete="CASCADE"), primary_key=True, index=True),
+)
+
+
 class Job(Base):
     __tablename__ = "jobs"
 
@@ -14,3 +24,20 @@ class Job(Base):
     status = Column(String, default=None)
     log = Column(String, default=None)
     is_active = Column(Boolean, default=True)  # True = job actif, False = job commenté (#)
+
+    upstreams = relationship(
+        "Job",
+        secondary=job_dependencies,
+        primaryjoin=id == job_dependencies.c.job_id,
+        secondaryjoin=id == job_dependencies.c.upstream_id,
+        backref="downstreams",
+    )
+
+
+class JobTableVersion(Base):
+    """Compteur de modifications de la table des jobs (une seule ligne, id = 1), utilisé pour les ETags"""
+    __tablename__ = "job_table_version"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(Float, nullable=False, default=0.0)  # Timestamp POSIX de la dernière modification
@@ -0,0 +1,266 @@
+import asyncio
+import logging
+
+import cronservice
+from events import broker
+from utils import get_done_path, get_run_status
+
+logger = logging.getLogger(__name__)
+
+# Intervalle (secondes) de vérification de la fin d'un job (lock libéré)
+POLL_INTERVAL = 1.0
+# Intervalle (secondes) de recherche des exécutions cron réussies dont les jobs aval sont à lancer
+CHAIN_INTERVAL = 5.0
+
+# Pipelines lancés, par job racine
+_pipelines = {}
+
+
+def load_dependency_graph(db) -> dict:
+    """Retourne les dépendances de tous les jobs : job_id -> ids des jobs amont"""
+    from models import job_dependencies
+
+    graph = {}
+    for job_id, upstream_id in db.query(job_dependencies.c.job_id, job_dependencies.c.upstream_id):
+        graph.setdefault(job_id, set()).add(upstream_id)
+    return graph
+
+
+def check_dependencies(graph: dict, job_id: int, upstream_ids: set) -> None:
+    """
+    Vérifie que job_id peut dépendre de upstream_ids sans créer de cycle.
+
+    Raises:
+        ValueError: Si un job amont dépend déjà (directement ou non) de job_id
+    """
+    if job_id in upstream_ids:
+        raise ValueError("A job cannot depend on itself")
+
+    # Cycle si job_id est lui-même un ancêtre de l'un des nouveaux jobs amont
+    stack, seen = list(upstream_ids), set()
+    while stack:
+        node = stack.pop()
+        if node == job_id:
+            raise ValueError("Dependency cycle detected")
+        if node not in seen:
+            seen.add(node)
+            stack.extend(graph.get(node, ()))
+
+
+def resolve_pipeline(graph: dict, root_id: int) -> dict:
+    """
+    Résout le DAG déclenché par un job : lui-même et tous ses descendants.
+    Les jobs amont extérieurs au pipeline ne sont pas attendus.
+
+    Returns:
+        dict: job_id -> ids des jobs amont à l'intérieur du pipeline
+    """
+    downstreams = {}
+    for job_id, upstream_ids in graph.items():
+        for upstream_id in upstream_ids:
+            downstreams.setdefault(upstream_id, set()).add(job_id)
+
+    nodes, stack = set(), [root_id]
+    while stack:
+        node = stack.pop()
+        if node not in nodes:
+            nodes.add(node)
+            stack.extend(downstreams.get(node, ()))
+
+    # Le job racine est le déclencheur : ses propres jobs amont ne sont pas attendus
+    return {node: graph.get(node, set()) & nodes if node != root_id else set() for node in nodes}
+
+
+def pipeline_levels(plan: dict) -> list:
+    """
+    Ordonne le pipeline en niveaux : les jobs d'un même niveau sont indépendants.
+
+    Raises:
+        ValueError: Si le graphe contient un cycle
+    """
+    remaining = {node: set(upstream_ids) for node, upstream_ids in plan.items()}
+    levels = []
+    while remaining:
+        level = sorted(node for node, upstream_ids in remaining.items() if not upstream_ids)
+        if not level:
+            raise ValueError("Dependency cycle detected")
+        levels.append(level)
+        for node in level:
+            del remaining[node]
+        for upstream_ids in remaining.values():
+            upstream_ids.difference_update(level)
+    return levels
+
+
+class PipelineRun:
+    """
+    Exécution d'un pipeline : chaque job démarre dès que tous ses jobs amont ont
+    réussi, les branches indépendantes tournent en parallèle. Un échec entraîne
+    l'abandon (skipped) de tous les jobs qui en dépendent.
+
+    Les jobs sont lancés via cronservice.run_manually et leur fin est détectée
+    par la libération de leur lock. Si root_done est vrai, le job racine vient de
+    réussir (exécution cron) : seuls ses jobs aval sont lancés.
+    """
+
+    def __init__(self, root_id: int, plan: dict, jobs: dict, root_done: bool = False):
+        self.root_id = root_id
+        self.root_done = root_done
+        self.plan = plan
+        # job_id -> (nom, commande, actif)
+        self.jobs = jobs
+        self.states = {}
+        self.downstreams = {node: set() for node in plan}
+        for node, upstream_ids in plan.items():
+            for upstream_id in upstream_ids:
+                self.downstreams[upstream_id].add(node)
+        for node in plan:
+            self._set_state(node, "pending")
+        self._tasks = set()
+        self.task = None
+
+    def start(self) -> None:
+        self.task = asyncio.ensure_future(self._run())
+
+    def is_running(self) -> bool:
+        return self.task is not None and not self.task.done()
+
+    def _set_state(self, job_id: int, state: str) -> None:
+        self.states[job_id] = state
+        broker.publish(job_id, pipeline=state)
+
+    async def _run(self) -> None:
+        logger.info(f"Starting pipeline from job {self.root_id} ({len(self.plan)} job(s))")
+        if self.root_done:
+            self._set_state(self.root_id, "success")
+            for downstream_id in sorted(self.downstreams[self.root_id]):
+                self._settle(downstream_id)
+        else:
+            self._settle(self.root_id)
+        while self._tasks:
+            done, _ = await asyncio.wait(self._tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                self._tasks.discard(task)
+                job_id = task.result()
+                for downstream_id in sorted(self.downstreams[job_id]):
+                    self._settle(downstream_id)
+        logger.info(f"Pipeline from job {self.root_id} finished: {self.states}")
+
+    def _settle(self, job_id: int) -> None:
+        """Lance un job en attente si ses jobs amont ont réussi, l'abandonne si l'un a échoué"""
+        if self.states[job_id] != "pending":
+            return
+
+        upstream_states = [self.states[upstream_id] for upstream_id in self.plan[job_id]]
+        if any(state in ("failed", "skipped") for state in upstream_states) or not self.jobs[job_id][2]:
+            self._set_state(job_id, "skipped")
+            for downstream_id in self.downstreams[job_id]:
+                self._settle(downstream_id)
+        elif all(state == "success" for state in upstream_states):
+            self._set_state(job_id, "running")
+            self._tasks.add(asyncio.ensure_future(self._run_job(job_id)))
+
+    async def _run_job(self, job_id: int) -> int:
+        loop = asyncio.get_event_loop()
+        name, command, _ = self.jobs[job_id]
+        try:
+            while True:
+                result = await loop.run_in_executor(None, cronservice.run_manually, name, job_id, command)
+                if result["success"]:
+                    break
+                if result["pid"] is None:
+                    logger.error(f"Pipeline job {job_id} ({name}) failed to start: {result['message']}")
+                    self._set_state(job_id, "failed")
+                    return job_id
+
+                # Exécution lancée hors du pipeline (cron, manuelle) : son résultat ne
+                # compte pas, on attend sa fin pour lancer celle du pipeline
+                logger.info(f"Pipeline job {job_id} ({name}) already running with PID {result['pid']}, waiting")
+                await self._wait(job_id)
+
+            await self._wait(job_id)
+
+            # Code de retour de l'exécution (fichier de statut), pas le dernier mot du log
+            status = await loop.run_in_executor(None, get_run_status, job_id)
+            self._set_state(job_id, "success" if status == "Success" else "failed")
+        except Exception as e:
+            logger.error(f"Error running pipeline job {job_id} ({name}): {e}", exc_info=True)
+            self._set_state(job_id, "failed")
+        return job_id
+
+    async def _wait(self, job_id: int) -> None:
+        """Attend la libération du lock d'un job"""
+        loop = asyncio.get_event_loop()
+        while (await loop.run_in_executor(None, cronservice.is_job_running, job_id))[0]:
+            await asyncio.sleep(POLL_INTERVAL)
+
+
+def start_pipeline(root_id: int, plan: dict, jobs: dict, root_done: bool = False) -> PipelineRun:
+    """
+    Lance le pipeline d'un job racine (ses seuls jobs aval si root_done).
+
+    Raises:
+        RuntimeError: Si un pipeline est déjà en cours pour ce job
+    """
+    current = _pipelines.get(root_id)
+    if current is not None and current.is_running():
+        raise RuntimeError("Pipeline already running")
+
+    run = PipelineRun(root_id, plan, jobs, root_done)
+    _pipelines[root_id] = run
+    run.start()
+    return run
+
+
+def get_pipeline(root_id: int) -> PipelineRun | None:
+    return _pipelines.get(root_id)
+
+
+def take_scheduled_runs(graph: dict) -> list:
+    """
+    Retourne les jobs ayant des jobs aval dont une exécution cron vient de réussir.
+    Leur marqueur est consommé : chaque exécution n'est chaînée qu'une fois.
+    """
+    roots = []
+    for root_id in sorted({upstream_id for upstream_ids in graph.values() for upstream_id in upstream_ids}):
+        try:
+            get_done_path(root_id).unlink()
+        except FileNotFoundError:
+            # Pas d'exécution réussie, ou marqueur pris par une autre instance
+            continue
+        roots.append(root_id)
+    return roots
+
+
+def _load_scheduled_pipelines() -> list:
+    """(job racine, plan, jobs) des pipelines à lancer après des exécutions cron réussies"""
+    from database import SessionLocal
+    from models import Job
+
+    db = SessionLocal()
+    try:
+        graph = load_dependency_graph(db)
+        pipelines = []
+        for root_id in take_scheduled_runs(graph):
+            plan = resolve_pipeline(graph, root_id)
+            jobs = {job.id: (job.name, job.command, job.is_active) for job in db.query(Job).filter(Job.id.in_(plan))}
+            pipelines.append((root_id, plan, jobs))
+        return pipelines
+    finally:
+        db.close()
+
+
+async def watch_scheduled_runs(interval: float = CHAIN_INTERVAL) -> None:
+    """Lance en tâche de fond les jobs aval des exécutions cron réussies"""
+    loop = asyncio.get_event_loop()
+    while True:
+        try:
+            for root_id, plan, jobs in await loop.run_in_executor(None, _load_scheduled_pipelines):
+                try:
+                    start_pipeline(root_id, plan, jobs, root_done=True)
+                    logger.info(f"Scheduled run of job {root_id} succeeded, starting its downstream jobs")
+                except RuntimeError:
+                    logger.warning(f"Pipeline from job {root_id} already running, scheduled run not chained")
+        except Exception as e:
+            logger.error(f"Error while chaining scheduled runs: {e}", exc_info=True)
+        await asyncio.sleep(interval)
@@ -1,12 +1,22 @@
 // JavaScript vanilla moderne - pas de jQuery nécessaire
 document.addEventListener("DOMContentLoaded", function () {
+  // Gestionnaires des éléments d'une ligne de job : appliqués aux lignes présentes,
+  // puis à chaque ligne insérée en direct (bindJobRow)
+  const rowBinders = [];
+  function onEachRow(selector, bind) {
+    rowBinders.push([selector, bind]);
+    document.querySelectorAll(selector).forEach(bind);
+  }
+  function bindJobRow(row) {
+    rowBinders.forEach(([selector, bind]) => row.querySelectorAll(selector).forEach(bind));
+  }
+
   // Toggle pour activer/désactiver les jobs
-  document.querySelectorAll(".job-toggle").forEach((toggle) => {
+  onEachRow(".job-toggle", (toggle) => {
     toggle.addEventListener("change", function () {
       const jobId = this.getAttribute("data-job-id");
       const isChecked = this.checked;
       const row = this.closest("tr");
-      const runButton = row.querySelector(".ui.grey.basic.button");
 
       console.log(
         `Toggling job ${jobId} to ${isChecked ? "active" : "inactive"}`
@@ -29,17 +39,11 @@ document.addEventListener("DOMContentLoaded", function () {
           if (data.success) {
             console.log(`Job ${jobId} toggled successfully:`, data);
 
-            // Mettre à jour l'apparence de la ligne
-            if (data.is_active) {
-              row.classList.remove("disabled-job");
-              if (runButton) runButton.disabled = false;
-            } else {
-              row.classList.add("disabled-job");
-              if (runButton) runButton.disabled = true;
-            }
-
-            // Recharger pour mettre à jour le "Next Run"
-            setTimeout(() => location.reload(), 500);
+            // Mettre à jour la ligne sans recharger la page
+            applyJobEvent(row, {
+              is_active: data.is_active,
+              next_run: data.next_run,
+            });
           } else {
             alert(`❌ ${data.message || "Unknown error"}`);
             // Remettre le toggle à son état précédent
@@ -105,7 +109,7 @@ document.addEventListener("DOMContentLoaded", function () {
   });
 
   // Boutons "Delete" (poubelle)
-  document.querySelectorAll(".delete-btn").forEach((button) => {
+  onEachRow(".delete-btn", (button) => {
     button.addEventListener("click", function () {
       if (confirm("Are you sure you want to delete this job?")) {
         const id = this.value;
@@ -123,7 +127,7 @@ document.addEventListener("DOMContentLoaded", function () {
   });
 
   // Boutons "Run Now" (play)
-  document.querySelectorAll(".run-btn").forEach((button) => {
+  onEachRow(".run-btn", (button) => {
     button.addEventListener("click", function (e) {
       e.preventDefault();
       e.stopPropagation();
@@ -181,6 +185,38 @@ document.addEventListener("DOMContentLoaded", function () {
     });
   });
 
+  // Boutons "Run pipeline" - lance le job et ceux qui en dépendent
+  onEachRow(".pipeline-btn", (button) => {
+    button.addEventListener("click", function () {
+      const id = this.value;
+
+      fetch(`/run_pipeline/${id}/`, {
+        method: "GET",
+        headers: { Accept: "application/json" },
+        cache: "no-cache",
+      })
+        .then((response) => response.json())
+        .then((data) => {
+          if (data.success) {
+            alert(`✅ ${data.message}`);
+          } else {
+            alert(`⚠️ ${data.detail || data.message || "Unknown error"}`);
+          }
+        })
+        .catch((error) => alert(`❌ Error: ${error.message}`));
+    });
+  });
+
+  // Lit le champ "Depends on" (IDs séparés par des virgules)
+  function readDependsOn() {
+    const input = document.getElementById("depends_on");
+    if (!input) return [];
+    return input.value
+      .split(",")
+      .map((value) => parseInt(value.trim(), 10))
+      .filter((value) => !isNaN(value));
+  }
+
   // Bouton "Save" - créer un job
   const saveBtn = document.getElementById("save");
   if (saveBtn) {
@@ -199,11 +235,12 @@ document.addEventListener("DOMContentLoaded", function () {
             command: command,
             name: command_name,
             schedule: schedule,
+            depends_on: readDependsOn(),
           }),
         })
           .then((response) => {
             if (response.status === 404) {
-              alert("Make sure the cron expression is valid.");
+              alert("Make sure the cron expression and dependencies are valid.");
             }
             return response.json();
           })
@@ -241,11 +278,14 @@ document.addEventListener("DOMContentLoaded", function () {
             command: command,
             name: command_name,
             schedule: schedule,
+            depends_on: readDependsOn(),
           }),
         })
           .then((response) => {
             if (response.status === 500) {
               alert("Make sure the cron expression is valid.");
+            } else if (response.status === 400 || response.status === 404) {
+              alert("Make sure the dependencies are valid (existing jobs, no cycle).");
             }
             return response.json();
           })
@@ -256,7 +296,7 @@ document.addEventListener("DOMContentLoaded", function () {
   }
 
   // Popups "Show Command" - toggle visibility
-  document.querySelectorAll(".custom.button").forEach((button) => {
+  onEachRow(".custom.button", (button) => {
     button.addEventListener("click", function (e) {
       e.stopPropagation();
 
@@ -323,6 +363,7 @@ document.addEventListener("DOMContentLoaded", function () {
             const logOutput = document.getElementById("log-output");
             if (logOutput) {
               logOutput.textContent = "";
+              logOutput.dataset.logSize = "0";
             }
           } else {
             alert("❌ Failed to clear logs");
@@ -335,34 +376,196 @@ document.addEventListener("DOMContentLoaded", function () {
     });
   }
 
+  // Récupère les lignes ajoutées au log affiché (304 si rien n'a changé).
+  // Une seule requête à la fois, au plus une par LOGS_REFRESH_INTERVAL : les
+  // notifications reçues entre-temps sont regroupées en une requête suivante
+  const LOGS_REFRESH_INTERVAL = 1000;
+  let logsRequest = null;
+  let logsPending = false;
+  function refreshLogs(jobId) {
+    const logOutput = document.getElementById("log-output");
+    if (!logOutput) return;
+    if (logsRequest) {
+      logsPending = true;
+      return;
+    }
+    console.log(`Refreshing logs for job ${jobId}`);
+
+    const offset = parseInt(logOutput.dataset.logSize || "0", 10);
+    logsRequest = fetch(`/refresh_logs/${jobId}/?offset=${offset}`, {
+      method: "GET",
+      headers: { Accept: "application/json" },
+    })
+      .then((response) => response.json())
+      .then((data) => {
+        if (data.success) {
+          if (data.reset || (offset === 0 && data.log_size > 0)) {
+            // Log vidé entre-temps, ou premier contenu : remplacer l'affichage
+            logOutput.textContent = data.log_content;
+          } else if (data.log_content) {
+            logOutput.appendChild(document.createTextNode(data.log_content));
+          }
+          logOutput.dataset.logSize = data.log_size;
+          console.log("Logs refreshed successfully");
+        } else {
+          alert("❌ Failed to refresh logs");
+        }
+      })
+      .catch((error) => {
+        console.error("Error:", error);
+        alert(`❌ Error: ${error.message}`);
+      })
+      .then(() => new Promise((resolve) => setTimeout(resolve, LOGS_REFRESH_INTERVAL)))
+      .then(() => {
+        logsRequest = null;
+        if (logsPending) {
+          logsPending = false;
+          refreshLogs(jobId);
+        }
+      });
+  }
+
   // Bouton "Refresh Logs" - recharge les logs
   const refreshLogsBtn = document.getElementById("refresh-logs");
   if (refreshLogsBtn) {
     refreshLogsBtn.addEventListener("click", function () {
-      const jobId = this.getAttribute("data-job-id");
-      console.log(`Refreshing logs for job ${jobId}`);
+      refreshLogs(this.getAttribute("data-job-id"));
+    });
+  }
 
-      fetch(`/refresh_logs/${jobId}/`, {
-        method: "GET",
-        headers: { Accept: "application/json" },
+  // Mises à jour en direct (Server-Sent Events) : seuls les champs modifiés sont reçus
+  const jobTable = document.querySelector("#features table");
+  const logJobId = refreshLogsBtn ? refreshLogsBtn.getAttribute("data-job-id") : null;
+
+  // Insère (ou remplace) la ligne d'un job, rendue par le serveur pour ce seul job
+  const pendingRows = new Set();
+  function fetchJobRow(jobId) {
+    jobId = String(jobId);
+    if (pendingRows.has(jobId)) return;
+    pendingRows.add(jobId);
+
+    fetch(`/jobs/${jobId}/row`, { headers: { Accept: "text/html" } })
+      .then((response) => (response.ok ? response.text() : null))
+      .then((html) => {
+        if (html === null) return;
+        const template = document.createElement("template");
+        template.innerHTML = html.trim();
+        const newRow = template.content.querySelector("tr");
+        const row = document.querySelector(`tr[data-job-id="${jobId}"]`);
+        if (row) {
+          row.replaceWith(newRow);
+        } else {
+          (jobTable.tBodies[0] || jobTable.createTBody()).appendChild(newRow);
+        }
+        bindJobRow(newRow);
       })
-        .then((response) => response.json())
-        .then((data) => {
-          if (data.success) {
-            // Mettre à jour l'affichage des logs
-            const logOutput = document.getElementById("log-output");
-            if (logOutput) {
-              logOutput.textContent = data.log_content;
-            }
-            console.log("Logs refreshed successfully");
-          } else {
-            alert("❌ Failed to refresh logs");
-          }
-        })
-        .catch((error) => {
-          console.error("Error:", error);
-          alert(`❌ Error: ${error.message}`);
-        });
+      .catch((error) => console.error("Error fetching job row:", error))
+      .finally(() => pendingRows.delete(jobId));
+  }
+
+  // Instantané envoyé par le serveur à chaque connexion, y compris après une
+  // reconnexion : rattrape les événements manqués sans recharger la page
+  function applySnapshot(snapshot) {
+    const logOutput = document.getElementById("log-output");
+    const logState = logJobId ? snapshot.jobs[logJobId] : null;
+    if (logOutput && logState && logState.log_size !== parseInt(logOutput.dataset.logSize || "0", 10)) {
+      refreshLogs(logJobId);
+    }
+
+    if (!jobTable) return;
+
+    Object.entries(snapshot.jobs).forEach(([jobId, state]) => {
+      const row = document.querySelector(`tr[data-job-id="${jobId}"]`);
+      if (row) {
+        applyJobEvent(row, state);
+      } else {
+        fetchJobRow(jobId);
+      }
     });
+    if (snapshot.complete) {
+      // Jobs supprimés pendant la déconnexion
+      jobTable.querySelectorAll("tr[data-job-id]").forEach((row) => {
+        if (!(row.dataset.jobId in snapshot.jobs)) row.remove();
+      });
+    }
+  }
+
+  if ((jobTable || logJobId) && window.EventSource) {
+    const source = new EventSource("/events");
+
+    source.onmessage = function (message) {
+      const event = JSON.parse(message.data);
+
+      if (event.event === "snapshot") {
+        applySnapshot(event);
+        return;
+      }
+
+      // Page des logs : récupérer les lignes ajoutées au log du job affiché
+      if (logJobId === String(event.job_id) && ("log_size" in event || event.event === "finished")) {
+        refreshLogs(logJobId);
+      }
+
+      if (!jobTable) return;
+
+      const row = document.querySelector(`tr[data-job-id="${event.job_id}"]`);
+      if (event.event === "created") {
+        fetchJobRow(event.job_id);
+        // Ses jobs amont deviennent racines de pipeline (bouton "Run pipeline")
+        (event.upstreams || []).forEach(fetchJobRow);
+      } else if (event.event === "deleted") {
+        if (row) row.remove();
+      } else if (row) {
+        applyJobEvent(row, event);
+      } else {
+        // Job inconnu de cette page (créé pendant une déconnexion)
+        fetchJobRow(event.job_id);
+      }
+    };
   }
 });
+
+// Applique un changement d'état (diff) à la ligne d'un job du tableau
+function applyJobEvent(row, event) {
+  const runButton = row.querySelector(".run-btn");
+  const toggle = row.querySelector(".job-toggle");
+  const nextRunCell = row.querySelector('[data-field="next_run"] code');
+  const statusCell = row.querySelector('[data-field="status"] code');
+
+  if ("next_run" in event) {
+    row.dataset.nextRun = event.next_run || "";
+  }
+
+  if ("is_active" in event) {
+    if (toggle) toggle.checked = event.is_active;
+    if (event.is_active) {
+      row.classList.remove("disabled-job");
+      if (runButton) runButton.disabled = false;
+    } else {
+      row.classList.add("disabled-job");
+      if (runButton) runButton.disabled = true;
+    }
+  }
+
+  if (nextRunCell && ("next_run" in event || "is_active" in event)) {
+    const isActive = !row.classList.contains("disabled-job");
+    nextRunCell.textContent =
+      isActive && row.dataset.nextRun ? row.dataset.nextRun : "(disabled)";
+  }
+
+  if (statusCell) {
+    if (event.pipeline === "pending" || event.pipeline === "skipped") {
+      statusCell.textContent = `Pipeline: ${event.pipeline}`;
+    } else if (event.running) {
+      statusCell.textContent = "Running";
+    } else if ("status" in event) {
+      statusCell.textContent = event.status;
+    } else if (event.event === "finished" && row.dataset.status) {
+      statusCell.textContent = row.dataset.status;
+    }
+  }
+
+  if ("status" in event) {
+    row.dataset.status = event.status;
+  }
+}
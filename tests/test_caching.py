@@ -0,0 +1,79 @@
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import caching
+from database import run_migrations
+from models import Job
+
+
+@pytest.fixture
+def sessions(tmp_path):
+    """Deux sessions sur la même base, comme deux instances de l'application"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'jobs.db'}")
+    run_migrations(engine)
+    factory = sessionmaker(bind=engine)
+    first, second = factory(), factory()
+    caching._job_names.update({"version": -1, "names": {}})
+    yield first, second
+    first.close()
+    second.close()
+
+
+def test_bump_is_visible_to_other_sessions(sessions):
+    first, second = sessions
+    version, _ = caching.get_job_table_version(second)
+
+    first.add(Job(name="backup", command="echo 1", schedule="* * * * *"))
+    caching.bump_job_table_version(first)
+    first.commit()
+
+    new_version, updated_at = caching.get_job_table_version(second)
+    assert new_version == version + 1
+    assert updated_at > 0
+
+
+def test_bump_is_rolled_back_with_the_change(sessions):
+    first, second = sessions
+    version, _ = caching.get_job_table_version(second)
+
+    caching.bump_job_table_version(first)
+    first.rollback()
+
+    assert caching.get_job_table_version(second)[0] == version
+
+
+def test_job_names_refreshed_after_change_from_another_session(sessions):
+    first, second = sessions
+    assert caching.get_job_names(second) == {}
+
+    first.add(Job(name="backup", command="echo 1", schedule="* * * * *"))
+    caching.bump_job_table_version(first)
+    first.commit()
+
+    assert list(caching.get_job_names(second).values()) == ["backup"]
+
+
+def test_etag_depends_on_version():
+    assert caching.compute_etag(1, "home") == caching.compute_etag(1, "home")
+    assert caching.compute_etag(1, "home") != caching.compute_etag(2, "home")
+
+
+@pytest.mark.parametrize(
+    "headers, expected",
+    [
+        ({"if-none-match": 'W/"abc"'}, True),
+        ({"if-none-match": '"abc"'}, True),
+        ({"if-none-match": 'W/"other", W/"abc"'}, True),
+        ({"if-none-match": 'W/"other"'}, False),
+        ({"if-modified-since": "Thu, 01 Jan 2026 00:00:00 GMT"}, False),
+        ({"if-modified-since": "Thu, 01 Jan 2099 00:00:00 GMT"}, True),
+        ({}, False),
+    ],
+)
+def test_is_not_modified(headers, expected):
+    request = SimpleNamespace(headers=headers)
+    last_modified = 1_800_000_000.0  # 2027
+    assert caching.is_not_modified(request, 'W/"abc"', last_modified) is expected
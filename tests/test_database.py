@@ -0,0 +1,101 @@
+import os
+
+import pytest
+from sqlalchemy import create_engine, inspect, text
+
+import models
+from database import get_engine_options, normalize_database_url, run_migrations
+
+HEAD_REVISION = "0003"
+
+
+def test_normalize_database_url_rewrites_postgres_scheme():
+    assert normalize_database_url("postgres://u:p@db:5432/cron") == "postgresql://u:p@db:5432/cron"
+    assert normalize_database_url("postgresql://u:p@db/cron") == "postgresql://u:p@db/cron"
+    assert normalize_database_url("sqlite:///./jobs.db") == "sqlite:///./jobs.db"
+
+
+def test_engine_options_sqlite():
+    assert get_engine_options("sqlite:///./jobs.db") == {"connect_args": {"check_same_thread": False}}
+
+
+def test_engine_options_postgresql_pool(monkeypatch):
+    monkeypatch.setenv("DB_POOL_SIZE", "20")
+    monkeypatch.delenv("DB_MAX_OVERFLOW", raising=False)
+
+    options = get_engine_options("postgresql://u:p@db/cron")
+
+    assert options["pool_size"] == 20
+    assert options["max_overflow"] == 10
+    assert options["pool_pre_ping"] is True
+    assert "connect_args" not in options
+
+
+def _revision(engine) -> str:
+    with engine.connect() as connection:
+        return connection.execute(text("SELECT version_num FROM alembic_version")).scalar()
+
+
+def test_run_migrations_creates_schema(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'jobs.db'}")
+
+    run_migrations(engine)
+
+    tables = inspect(engine).get_table_names()
+    assert {"jobs", "job_dependencies", "alembic_version"} <= set(tables)
+    assert _revision(engine) == HEAD_REVISION
+
+
+def test_run_migrations_stamps_create_all_database(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'jobs.db'}")
+    # Schéma tel que créé par l'ancien models.Base.metadata.create_all
+    models.Job.__table__.create(engine)
+    with engine.begin() as connection:
+        connection.execute(text("INSERT INTO jobs (name, command, schedule) VALUES ('backup', 'echo 1', '* * * * *')"))
+
+    run_migrations(engine)
+
+    assert _revision(engine) == HEAD_REVISION
+    assert "job_dependencies" in inspect(engine).get_table_names()
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT name FROM jobs")).scalars().all() == ["backup"]
+
+
+def test_run_migrations_is_idempotent(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'jobs.db'}")
+
+    run_migrations(engine)
+    run_migrations(engine)
+
+    assert _revision(engine) == HEAD_REVISION
+
+
+@pytest.fixture
+def postgres_engine():
+    """Moteur PostgreSQL de test (TEST_POSTGRES_URL), ignoré si aucun serveur n'est disponible"""
+    url = os.environ.get("TEST_POSTGRES_URL")
+    if not url:
+        pytest.skip("TEST_POSTGRES_URL not set")
+    pytest.importorskip("psycopg2")
+
+    url = normalize_database_url(url)
+    engine = create_engine(url, **get_engine_options(url))
+    try:
+        engine.connect().close()
+    except Exception as e:
+        pytest.skip(f"PostgreSQL not available: {e}")
+
+    yield engine
+
+    with engine.begin() as connection:
+        connection.execute(text("DROP TABLE IF EXISTS job_dependencies, jobs, job_table_version, alembic_version CASCADE"))
+    engine.dispose()
+
+
+def test_run_migrations_postgresql(postgres_engine):
+    run_migrations(postgres_engine)
+
+    tables = inspect(postgres_engine).get_table_names()
+    assert {"jobs", "job_dependencies", "alembic_version"} <= set(tables)
+    assert _revision(postgres_engine) == HEAD_REVISION
+    assert postgres_engine.pool.size() == get_engine_options(str(postgres_engine.url))["pool_size"]
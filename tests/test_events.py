@@ -0,0 +1,122 @@
+import asyncio
+import json
+import os
+
+import pytest
+
+import cronservice
+import database
+import events
+import utils
+from events import CLOSE, EventBroker
+
+
+@pytest.fixture
+def broker(monkeypatch):
+    """Broker dont les événements sont collectés au lieu d'être diffusés"""
+    broker = EventBroker()
+    broker.sent = []
+    monkeypatch.setattr(broker, "_dispatch", broker.sent.append)
+    return broker
+
+
+def test_publish_sends_only_changed_fields(broker):
+    broker.publish(1, running=False, status="Success", next_run="12:00")
+    broker.publish(1, running=False, status="Success", next_run="12:01")
+    broker.publish(1, running=False, status="Success", next_run="12:01")
+
+    assert broker.sent == [
+        {"event": "updated", "job_id": 1, "running": False, "status": "Success", "next_run": "12:00"},
+        {"event": "updated", "job_id": 1, "next_run": "12:01"},
+    ]
+
+
+def test_publish_classifies_started_and_finished(broker):
+    broker.publish(1, running=False)
+    broker.publish(1, running=True)
+    broker.publish(1, running=False, status="Failed")
+
+    assert [event["event"] for event in broker.sent] == ["updated", "started", "finished"]
+    assert broker.sent[-1] == {"event": "finished", "job_id": 1, "running": False, "status": "Failed"}
+
+
+def test_deleted_job_state_is_forgotten(broker):
+    broker.publish(1, running=False)
+    broker.publish_deleted(1)
+    broker.publish(1, running=False)
+
+    assert [event["event"] for event in broker.sent] == ["updated", "deleted", "updated"]
+
+
+def test_slow_subscriber_is_dropped_with_close_marker():
+    async def run():
+        broker = EventBroker()
+        slow = asyncio.Queue(maxsize=events.SUBSCRIBER_QUEUE_SIZE)
+        broker._subscribers.add(slow)
+        for number in range(events.SUBSCRIBER_QUEUE_SIZE + 1):
+            broker._put(str(number))
+        return broker, slow
+
+    broker, slow = asyncio.run(run())
+    assert slow not in broker._subscribers
+    # Les événements en attente sont abandonnés : seul CLOSE reste, le flux se termine
+    assert slow.qsize() == 1
+    assert slow.get_nowait() is CLOSE
+
+
+def test_subscriber_receives_snapshot_first(monkeypatch):
+    async def no_watch():
+        pass
+
+    async def run():
+        broker = EventBroker()
+        monkeypatch.setattr(broker, "_watch", no_watch)
+        broker.publish(1, running=True, status="Success")
+        queue = broker.subscribe()
+        return json.loads(queue.get_nowait())
+
+    assert asyncio.run(run()) == {
+        "event": "snapshot",
+        "complete": False,
+        "jobs": {"1": {"running": True, "status": "Success"}},
+    }
+
+
+@pytest.fixture
+def poll_env(tmp_path, monkeypatch):
+    """Un job 990101 ("etl") avec un log et un lock tenu par ce processus"""
+    monkeypatch.setattr(utils, "LOG_DIR", tmp_path)
+    monkeypatch.setattr(database, "SessionLocal", lambda: type("Session", (), {"close": lambda self: None})())
+    monkeypatch.setattr("caching.get_job_names", lambda db: {990101: "etl", 990102: "idle"})
+    monkeypatch.setattr(cronservice, "get_next_schedule", lambda name: "2026-10-19 12:00")
+
+    (tmp_path / "etl.log").write_text("Oct 19 10:00:00 step 1\nOct 19 10:00:01 Failed\n")
+    lock = cronservice.get_lock_file_path(990101)
+    lock.write_text(str(os.getpid()))
+    yield tmp_path
+    lock.unlink(missing_ok=True)
+
+
+def test_poll_publishes_running_status_and_log_size(broker, poll_env):
+    context = {"stamps": {}, "minute": None}
+    broker._states[990103] = {"running": False}
+    broker._poll(context)
+
+    by_job = {event["job_id"]: event for event in broker.sent}
+    assert by_job[990101] == {
+        "event": "started",
+        "job_id": 990101,
+        "running": True,
+        "status": "Failed",
+        "log_size": (poll_env / "etl.log").stat().st_size,
+        "next_run": "2026-10-19 12:00",
+    }
+    assert by_job[990102]["status"] == "No log yet"
+    # Job supprimé ailleurs : son état est oublié, l'instantané est complet
+    assert 990103 not in broker._states
+    assert broker._polled
+
+    # Second passage sans changement : rien n'est publié
+    broker.sent.clear()
+    broker._poll(context)
+    assert broker.sent == []
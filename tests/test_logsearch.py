@@ -0,0 +1,153 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import logsearch
+from logsearch import LogIndex
+
+
+@pytest.fixture
+def small_blocks(monkeypatch):
+    """Blocs de quelques lignes pour que les petits fichiers de test soient indexés"""
+    monkeypatch.setattr(logsearch, "BLOCK_SIZE", 256)
+    monkeypatch.setattr(logsearch, "HEAD_SIZE", 64)
+
+
+def write_run(path, start: datetime, messages, mode="a"):
+    """Écrit une exécution : une ligne par seconde au format de "ts" """
+    with open(path, mode) as f:
+        for offset, message in enumerate(messages):
+            f.write(f"{start + timedelta(seconds=offset):%b %d %H:%M:%S} {message}\n")
+
+
+def lines(results):
+    return [(match["line_number"], match["line"]) for match in results]
+
+
+@pytest.mark.parametrize("indexed", [False, True])
+def test_cleared_log_is_not_searched_with_stale_index(tmp_path, small_blocks, indexed):
+    path = tmp_path / "backup.log"
+    path.write_text("Oct 19 10:00:00 run ok\n" * (100 if indexed else 10))
+    index = LogIndex(tmp_path)
+    index.refresh()
+
+    # Même inode, même taille ou plus grande : seul le contenu a changé
+    path.write_text("Oct 19 11:00:00 failed\n" * 120)
+    assert len(list(index.search("failed", limit=1000))) == 120
+
+    index.refresh()
+    assert len(list(index.search("failed", limit=1000))) == 120
+    assert list(index.search("run ok")) == []
+
+
+def test_forget_drops_the_file_index(tmp_path, small_blocks):
+    path = tmp_path / "myjob.log"
+    path.write_text("Oct 19 10:00:00 run ok\n" * 100)
+    index = LogIndex(tmp_path)
+    index.refresh()
+    assert path in index._files
+
+    index.forget("my job")
+    assert path not in index._files
+
+
+def test_indexed_and_linear_searches_agree(tmp_path, small_blocks):
+    path = tmp_path / "etl.log"
+    start = datetime.now() - timedelta(hours=3)
+    for run in range(3):
+        messages = [f"step {step} rows={step * 7}" for step in range(40)]
+        messages[25] = "Traceback: ConnectionRefusedError"
+        write_run(path, start + timedelta(hours=run), messages)
+
+    indexed = LogIndex(tmp_path)
+    indexed.refresh()
+    assert indexed._files[path].end[0] > 3
+
+    for query, context in [("connectionrefused", 0), ("ConnectionRefused", 3), ("rows=1", 1), ("step 3", 2)]:
+        expected = list(LogIndex(tmp_path).search(query, context=context, limit=1000))
+        assert list(indexed.search(query, context=context, limit=1000)) == expected
+        assert expected
+
+
+def test_match_reports_line_number_context_and_run_start(tmp_path, small_blocks):
+    path = tmp_path / "etl.log"
+    start = datetime.now().replace(microsecond=0) - timedelta(hours=2)
+    write_run(path, start, [f"step {step}" for step in range(30)])
+    write_run(path, start + timedelta(hours=1), [f"step {step}" for step in range(20)] + ["Failed"])
+    index = LogIndex(tmp_path)
+    index.refresh()
+
+    [match] = index.search("Failed", context=2)
+    assert match["file"] == "etl"
+    assert match["line_number"] == 51
+    assert match["before"][1].endswith("step 19")
+    assert match["after"] == []
+    assert match["run_started"] == (start + timedelta(hours=1)).isoformat()
+    assert match["timestamp"] == (start + timedelta(hours=1, seconds=20)).isoformat()
+
+
+def test_since_and_until_filter_lines(tmp_path, small_blocks):
+    path = tmp_path / "etl.log"
+    start = datetime.now().replace(microsecond=0) - timedelta(hours=3)
+    for run in range(3):
+        write_run(path, start + timedelta(hours=run), ["run done"] + ["working"] * 20)
+    index = LogIndex(tmp_path)
+    index.refresh()
+
+    since = start + timedelta(minutes=30)
+    until = start + timedelta(hours=1, minutes=30)
+    [match] = index.search("run done", since=since, until=until)
+    assert match["timestamp"] == (start + timedelta(hours=1)).isoformat()
+
+
+def test_appended_lines_are_found_before_and_after_refresh(tmp_path, small_blocks):
+    path = tmp_path / "etl.log"
+    start = datetime.now() - timedelta(hours=1)
+    write_run(path, start, ["working"] * 50)
+    index = LogIndex(tmp_path)
+    index.refresh()
+    blocks, offset, _ = index._files[path].end
+    starts = list(index._files[path].starts)
+
+    write_run(path, start + timedelta(minutes=10), ["working"] * 50 + ["appended Failed"])
+    assert lines(index.search("appended")) == [(101, f"{start + timedelta(minutes=10, seconds=50):%b %d %H:%M:%S} appended Failed")]
+
+    file_index = index._files[path]
+    index.refresh()
+    new_blocks, new_offset, _ = index._files[path].end
+    assert new_blocks > blocks and new_offset > offset
+    # Les blocs déjà indexés ne sont pas recalculés
+    assert index._files[path] is file_index
+    assert list(file_index.starts[:blocks]) == starts
+    assert lines(index.search("appended"))[0][0] == 101
+
+
+def test_short_query_scans_each_line_once(tmp_path, small_blocks):
+    path = tmp_path / "etl.log"
+    path.write_text("Oct 19 10:00:00 ok\nOct 19 10:00:01 ko\n" * 50)
+    index = LogIndex(tmp_path)
+    index.refresh()
+
+    results = list(index.search("ok", limit=1000))
+    assert len(results) == 50
+    assert all(match["line"].endswith(" ok") for match in results)
+
+
+def test_search_is_limited_to_requested_files(tmp_path):
+    (tmp_path / "first.log").write_text("Oct 19 10:00:00 error\n")
+    (tmp_path / "second.log").write_text("Oct 19 10:00:00 error\n")
+    index = LogIndex(tmp_path)
+
+    assert [match["file"] for match in index.search("error")] == ["first", "second"]
+    assert [match["file"] for match in index.search("error", files={"second"})] == ["second"]
+    assert len(list(index.search("error", limit=1))) == 1
+    assert list(index.search("error", limit=0)) == []
+
+
+def test_parse_timestamp_formats():
+    now = datetime(2024, 1, 10, 12, 0, 0)
+    assert logsearch.parse_timestamp(b"Jan 10 11:59:00 ok", now) == datetime(2024, 1, 10, 11, 59).timestamp()
+    # Pas d'année dans "ts" : une date future appartient à l'année précédente
+    assert logsearch.parse_timestamp(b"Dec 31 23:00:00 ok", now) == datetime(2023, 12, 31, 23).timestamp()
+    assert logsearch.parse_timestamp(b"2024-01-10 08:00:00 Skipped", now) == datetime(2024, 1, 10, 8).timestamp()
+    assert logsearch.parse_timestamp(b"no timestamp", now) is None
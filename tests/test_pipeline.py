@@ -0,0 +1,222 @@
+import asyncio
+import subprocess
+from pathlib import Path
+
+import pytest
+
+import pipeline
+import utils
+from pipeline import PipelineRun, check_dependencies, pipeline_levels, resolve_pipeline, take_scheduled_runs
+
+# a -> b -> c, a -> d, e -> b (e est extérieur au pipeline lancé depuis a)
+GRAPH = {"b": {"a", "e"}, "c": {"b"}, "d": {"a"}}
+
+
+def test_check_dependencies_accepts_a_dag():
+    check_dependencies(GRAPH, "d", {"b", "e"})
+
+
+@pytest.mark.parametrize("job_id, upstream_ids", [("a", {"a"}), ("a", {"c"}), ("b", {"d", "c"})])
+def test_check_dependencies_rejects_cycles(job_id, upstream_ids):
+    with pytest.raises(ValueError):
+        check_dependencies(GRAPH, job_id, upstream_ids)
+
+
+def test_resolve_pipeline_keeps_descendants_and_ignores_outside_upstreams():
+    assert resolve_pipeline(GRAPH, "a") == {"a": set(), "b": {"a"}, "c": {"b"}, "d": {"a"}}
+    # Le job racine n'attend pas ses propres jobs amont
+    assert resolve_pipeline(GRAPH, "b") == {"b": set(), "c": {"b"}}
+
+
+def test_pipeline_levels():
+    assert pipeline_levels(resolve_pipeline(GRAPH, "a")) == [["a"], ["b", "d"], ["c"]]
+    with pytest.raises(ValueError):
+        pipeline_levels({"a": {"b"}, "b": {"a"}})
+
+
+class FakeJobs:
+    """Remplace cronservice / get_run_status : chaque job se termine aussitôt lancé"""
+
+    def __init__(self, monkeypatch, statuses=None, running=()):
+        self.statuses = statuses or {}
+        # Jobs déjà en cours hors du pipeline : is_job_running vrai au premier appel
+        self.running = set(running)
+        self.launched = []
+        monkeypatch.setattr(pipeline, "POLL_INTERVAL", 0)
+        monkeypatch.setattr(pipeline.cronservice, "run_manually", self.run_manually)
+        monkeypatch.setattr(pipeline.cronservice, "is_job_running", self.is_job_running)
+        monkeypatch.setattr(pipeline, "get_run_status", lambda job_id: self.statuses.get(job_id, "Success"))
+
+    def run_manually(self, name, job_id, command):
+        if job_id in self.running:
+            return {"success": False, "message": "Job already running", "pid": 123}
+        self.launched.append(job_id)
+        return {"success": True, "message": "Job launched", "pid": 456}
+
+    def is_job_running(self, job_id):
+        if job_id in self.running:
+            self.running.discard(job_id)
+            return True, 123
+        return False, None
+
+
+def run_pipeline(root_id, inactive=(), graph=GRAPH, root_done=False):
+    plan = resolve_pipeline(graph, root_id)
+    jobs = {job_id: (job_id, f"echo {job_id}", job_id not in inactive) for job_id in plan}
+
+    async def run():
+        pipeline_run = PipelineRun(root_id, plan, jobs, root_done)
+        pipeline_run.start()
+        await pipeline_run.task
+        return pipeline_run
+
+    return asyncio.run(run())
+
+
+def test_pipeline_runs_jobs_after_their_upstreams(monkeypatch):
+    jobs = FakeJobs(monkeypatch)
+    pipeline_run = run_pipeline("a")
+
+    assert pipeline_run.states == {"a": "success", "b": "success", "c": "success", "d": "success"}
+    assert jobs.launched[0] == "a"
+    assert jobs.launched.index("b") < jobs.launched.index("c")
+
+
+def test_failure_skips_downstream_jobs_only(monkeypatch):
+    jobs = FakeJobs(monkeypatch, statuses={"b": "Failed"})
+    pipeline_run = run_pipeline("a")
+
+    assert pipeline_run.states == {"a": "success", "b": "failed", "c": "skipped", "d": "success"}
+    assert "c" not in jobs.launched
+
+
+def test_inactive_job_is_skipped_with_its_downstreams(monkeypatch):
+    jobs = FakeJobs(monkeypatch)
+    pipeline_run = run_pipeline("a", inactive={"b"})
+
+    assert pipeline_run.states == {"a": "success", "b": "skipped", "c": "skipped", "d": "success"}
+    assert sorted(jobs.launched) == ["a", "d"]
+
+
+def test_job_already_running_is_waited_for_then_started(monkeypatch):
+    jobs = FakeJobs(monkeypatch, running={"b"})
+    pipeline_run = run_pipeline("a")
+
+    # L'exécution en cours n'est pas adoptée : le pipeline lance la sienne ensuite
+    assert "b" in jobs.launched
+    assert pipeline_run.states["c"] == "success"
+
+
+def test_job_that_cannot_start_fails(monkeypatch):
+    FakeJobs(monkeypatch)
+    monkeypatch.setattr(
+        pipeline.cronservice,
+        "run_manually",
+        lambda name, job_id, command: {"success": False, "message": "Launch failed", "pid": None},
+    )
+    pipeline_run = run_pipeline("b")
+
+    assert pipeline_run.states == {"b": "failed", "c": "skipped"}
+
+
+@pytest.fixture
+def cron_line(tmp_path, monkeypatch):
+    """Exécute la ligne crontab d'un job (par défaut l'aval 990002, qui dépend de "upstream" 990001)"""
+    monkeypatch.setattr(utils, "LOG_DIR", tmp_path)
+    paths = [
+        Path(f"/tmp/crontab_job_{job_id}.{suffix}") for job_id in (990001, 990002) for suffix in ("lock", "status", "done")
+    ]
+    marker = tmp_path / "ran"
+
+    def run(command=f"touch {marker}", job_id=990002, name="downstream", upstreams=((990001, "upstream"),)):
+        line = utils.add_log_file(command, name, job_id, list(upstreams))
+        subprocess.run(["sh", "-c", line], check=False, capture_output=True)
+        log = tmp_path / f"{name}.log"
+        return marker.exists(), log.read_text() if log.exists() else ""
+
+    yield run
+    for path in paths:
+        path.unlink(missing_ok=True)
+
+
+def set_status(job_id, code):
+    utils.get_status_path(job_id).write_text(f"{code}\n")
+
+
+def test_cron_line_runs_after_successful_upstream(cron_line):
+    set_status(990001, 0)
+    ran, log = cron_line()
+    assert ran
+    assert "Skipped" not in log
+    assert utils.get_run_status(990002) == "Success"
+
+
+@pytest.mark.parametrize("upstream_status", [1, utils.SKIPPED, None])
+def test_cron_line_skipped_after_failed_or_skipped_upstream(cron_line, upstream_status):
+    if upstream_status is not None:
+        set_status(990001, upstream_status)
+    ran, log = cron_line()
+    assert not ran
+    assert "Skipped: upstream job 990001 did not succeed" in log
+    # Ses propres jobs aval seront sautés à leur tour
+    assert utils.get_run_status(990002) == "Skipped"
+
+
+def test_cron_line_skipped_while_upstream_is_running(cron_line):
+    set_status(990001, 0)
+    with open("/tmp/crontab_job_990001.lock", "w") as f:
+        f.write("1")
+    ran, log = cron_line()
+    assert not ran
+    assert "Skipped: upstream job 990001 still running" in log
+
+
+def test_silent_success_is_not_read_from_a_stale_log(tmp_path, cron_line):
+    # La dernière ligne du log est celle d'une exécution précédente en échec
+    (tmp_path / "downstream.log").write_text("Oct 19 10:00:00 Failed\n")
+    set_status(990001, 0)
+    cron_line("true")
+    assert utils.watch_status("downstream", 990002) == "Success"
+
+    cron_line("false")
+    assert utils.get_run_status(990002) == "Failed"
+
+
+def test_silent_success_after_a_skipped_run(cron_line):
+    set_status(990001, 1)
+    cron_line("true")
+    assert utils.get_run_status(990002) == "Skipped"
+
+    # L'amont réussit ensuite : l'exécution silencieuse de l'aval compte comme un succès
+    set_status(990001, 0)
+    _, log = cron_line("true")
+    assert log.strip().endswith("did not succeed")
+    assert utils.get_run_status(990002) == "Success"
+
+
+def test_manual_run_records_its_status(tmp_path, monkeypatch):
+    monkeypatch.setattr(utils, "LOG_DIR", tmp_path)
+    status = utils.get_status_path(990002)
+    try:
+        for command, expected in [("true", "Success"), ("false", "Failed")]:
+            subprocess.run(["sh", "-c", utils.add_log_file(command, "manual", status_id=990002)], check=False)
+            assert utils.get_run_status(990002) == expected
+    finally:
+        status.unlink(missing_ok=True)
+
+
+def test_scheduled_root_run_starts_its_downstream_jobs(cron_line, monkeypatch):
+    graph = {990002: {990001}}
+    cron_line("false", job_id=990001, name="upstream", upstreams=())
+    assert take_scheduled_runs(graph) == []
+
+    cron_line("true", job_id=990001, name="upstream", upstreams=())
+    # Le marqueur de l'exécution réussie n'est consommé qu'une fois
+    assert take_scheduled_runs(graph) == [990001]
+    assert take_scheduled_runs(graph) == []
+
+    jobs = FakeJobs(monkeypatch)
+    pipeline_run = run_pipeline(990001, graph=graph, root_done=True)
+    # Le job racine a déjà tourné (cron) : seul son job aval est lancé
+    assert jobs.launched == [990002]
+    assert pipeline_run.states == {990001: "success", 990002: "success"}
@@ -0,0 +1,54 @@
+from types import SimpleNamespace
+
+import pytest
+
+import main
+
+
+@pytest.fixture(autouse=True)
+def startup_state(monkeypatch):
+    state = {"ready": False, "synced": 0, "failed": 0, "error": None}
+    monkeypatch.setattr(main, "_startup_state", state)
+    return state
+
+
+class FakeSession:
+    def __init__(self, jobs):
+        self.jobs = jobs
+
+    def query(self, model):
+        return self
+
+    def options(self, *options):
+        return self
+
+    def all(self):
+        return self.jobs
+
+    def close(self):
+        pass
+
+
+def test_sync_all_jobs_sets_ready_on_success(monkeypatch, startup_state):
+    jobs = [SimpleNamespace(id=1, name="backup", command="echo 1", schedule="* * * * *", is_active=True)]
+    monkeypatch.setattr(main, "SessionLocal", lambda: FakeSession(jobs))
+    monkeypatch.setattr(main.cronservice, "sync_jobs_to_cron", lambda jobs: {"synced": len(jobs), "failed": 0})
+
+    main.sync_all_jobs()
+
+    assert startup_state["ready"] is True
+    assert startup_state["synced"] == 1
+    assert startup_state["error"] is None
+
+
+def test_sync_all_jobs_not_ready_on_failure(monkeypatch, startup_state):
+    def fail(jobs):
+        raise IOError("crontab write failed")
+
+    monkeypatch.setattr(main, "SessionLocal", lambda: FakeSession([SimpleNamespace(name="backup")]))
+    monkeypatch.setattr(main.cronservice, "sync_jobs_to_cron", fail)
+
+    main.sync_all_jobs()
+
+    assert startup_state["ready"] is False
+    assert startup_state["error"] == "crontab write failed"
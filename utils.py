@@ -5,6 +5,13 @@ Command = str
 Name = str
 Schedule = str
 
+LOG_DIR = pathlib.Path("/app/logs")
+
+# Contenu du fichier de statut d'une exécution sautée faute de jobs amont réussis
+SKIPPED = "skipped"
+# Octets lus en fin de log pour déterminer le statut (le fichier n'est jamais lu en entier)
+STATUS_TAIL_SIZE = 4096
+
 
 def get_locale_from_accept_language(accept_language: str) -> str:
     """
@@ -30,45 +37,110 @@ def get_locale_from_accept_language(accept_language: str) -> str:
         return "en"
 
 
-def add_log_file(command: Command, name: Name, job_id: int = None) -> str:
+def get_log_path(name: Name) -> pathlib.Path:
+    """Retourne le chemin du fichier de log d'un job"""
     log_file_name = name.replace(" ", "")
-    log_path = f"/app/logs/{log_file_name}.log"
+    return LOG_DIR / f"{log_file_name}.log"
+
+
+def get_status_path(job_id: int) -> pathlib.Path:
+    """Fichier du statut de la dernière exécution d'un job : code de retour de sa commande, ou SKIPPED"""
+    return pathlib.Path(f"/tmp/crontab_job_{job_id}.status")
+
+
+def get_done_path(job_id: int) -> pathlib.Path:
+    """Marqueur déposé par une exécution cron réussie : l'application lance alors les jobs aval"""
+    return pathlib.Path(f"/tmp/crontab_job_{job_id}.done")
+
+
+def _run_command(command: Command, log_path: pathlib.Path, job_id: int) -> str:
+    """
+    Exécute la commande, sortie horodatée ajoutée au log. Son code de retour est
+    écrit dans le fichier de statut (celui du pipeline est celui de "ts").
+    """
+    status_path = get_status_path(job_id)
+    return (
+        f"rm -f {status_path}; "
+        f"{{ {command}; code=$?; echo $code > {status_path}; [ $code -eq 0 ] || echo Failed; }} "
+        f"2>&1 | /usr/bin/ts >> {log_path}"
+    )
+
+
+def add_log_file(
+    command: Command, name: Name, job_id: int = None, upstreams: list = (), status_id: int = None
+) -> str:
+    """
+    Construit la ligne à exécuter pour un job, sortie horodatée ajoutée à son log.
+
+    Args:
+        command: Commande du job
+        name: Nom du job (fichier de log)
+        job_id: ID du job pour une exécution cron, None pour une exécution manuelle
+        upstreams: Jobs amont (id, nom) d'une exécution cron : elle est sautée si l'un
+            d'eux est en cours ou si sa dernière exécution n'a pas réussi
+        status_id: ID du job d'une exécution manuelle, dont le statut est enregistré
+    """
+    log_path = get_log_path(name)
     
     if job_id is None:
         # Exécution manuelle : pas de vérification de lock (géré par le wrapper Python)
-        return f"{{ {command} || echo Failed; }} 2>&1 | /usr/bin/ts >> {log_path}"
+        if status_id is None:
+            return f"{{ {command} || echo Failed; }} 2>&1 | /usr/bin/ts >> {log_path}"
+        return _run_command(command, log_path, status_id)
     else:
-        # Exécution cron : vérification du lock avant d'exécuter
+        # Exécution cron : vérification du lock avant d'exécuter, lock pris pendant l'exécution
         lock_file = f"/tmp/crontab_job_{job_id}.lock"
-        return f'if [ ! -f {lock_file} ]; then {{ {command} || echo Failed; }} 2>&1 | /usr/bin/ts >> {log_path}; else echo "$(date \'+%Y-%m-%d %H:%M:%S\') Skipped: job already running (manual execution in progress)" >> {log_path}; fi'
+        status_path = get_status_path(job_id)
+        
+        def skip(reason: str) -> str:
+            return f'echo "$(date \'+%Y-%m-%d %H:%M:%S\') Skipped: {reason}" >> {log_path}'
+        
+        branches = []
+        for upstream_id, upstream_name in upstreams:
+            branches.append((
+                f"[ -f /tmp/crontab_job_{upstream_id}.lock ]",
+                skip(f"upstream job {upstream_id} still running"),
+            ))
+            branches.append((
+                f"[ \"$(cat {get_status_path(upstream_id)} 2>/dev/null)\" != 0 ]",
+                f"echo {SKIPPED} > {status_path}; {skip(f'upstream job {upstream_id} did not succeed')}",
+            ))
+        branches.append((
+            f"[ ! -f {lock_file} ]",
+            f"echo $$ > {lock_file}; "
+            f"{_run_command(command, log_path, job_id)}; "
+            f"[ \"$(cat {status_path} 2>/dev/null)\" = 0 ] && touch {get_done_path(job_id)}; "
+            f"rm -f {lock_file}",
+        ))
+        
+        line = " ".join(
+            f"{'if' if i == 0 else 'elif'} {condition}; then {action};" for i, (condition, action) in enumerate(branches)
+        )
+        return f"{line} else {skip('job already running (manual execution in progress)')}; fi"
 
 
 def delete_log_file(name: Name) -> None:
     try:
-        log_file_name = name.replace(" ", "")
-        file = pathlib.Path(f"/app/logs/{log_file_name}.log")
-        file.unlink()
+        get_log_path(name).unlink()
     except FileNotFoundError:
         return None
 
 
 def clear_logs(name: Name) -> None:
     """Vide le contenu du fichier de log sans le supprimer"""
-    log_file_name = name.replace(" ", "")
-    filename = f"/app/logs/{log_file_name}.log"
+    filename = get_log_path(name)
     try:
         with open(filename, 'w') as f:
             f.write("")
     except FileNotFoundError:
         # Créer le fichier s'il n'existe pas
-        pathlib.Path("/app/logs").mkdir(parents=True, exist_ok=True)
+        LOG_DIR.mkdir(parents=True, exist_ok=True)
         with open(filename, 'w') as f:
             f.write("")
 
 
 def load_logs(name: Name) -> str:
-    log_file_name = name.replace(" ", "")
-    filename = f"/app/logs/{log_file_name}.log"
+    filename = get_log_path(name)
     try:
         with open(filename) as f:
             return f.read()
@@ -76,15 +148,64 @@ def load_logs(name: Name) -> str:
         return "No log yet"
 
 
-def watch_status(name: Name) -> str:
-    log = load_logs(name)
-    if log == "No log yet":
-        return log
+def load_logs_from(name: Name, offset: int = 0) -> tuple[str, int, bool]:
+    """
+    Lit les lignes ajoutées au log d'un job après la position offset.
+
+    Returns:
+        tuple: (texte, position atteinte, reset). Si le log a été vidé depuis
+            (taille < offset), il est relu depuis le début et reset est vrai.
+            Une dernière ligne incomplète sera renvoyée à la lecture suivante.
+    """
+    try:
+        with open(get_log_path(name), "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            reset = offset > size
+            if reset:
+                offset = 0
+            f.seek(offset)
+            data = f.read(size - offset)
+    except FileNotFoundError:
+        return "", 0, offset > 0
+    end = data.rfind(b"\n") + 1
+    return data[:end].decode(errors="replace"), offset + end, reset
+
+
+def get_run_status(job_id: int) -> str | None:
+    """
+    Statut de la dernière exécution d'un job d'après son fichier de statut.
+
+    Returns:
+        str: "Success", "Failed" ou "Skipped", None si aucune exécution n'est connue
+    """
+    try:
+        code = get_status_path(job_id).read_text().strip()
+    except FileNotFoundError:
+        return None
+    if code == SKIPPED:
+        return "Skipped"
+    return "Success" if code == "0" else "Failed"
+
+
+def watch_status(name: Name, job_id: int = None) -> str:
+    """
+    Statut de la dernière exécution : son code de retour s'il est connu (job_id),
+    sinon le dernier mot du log dont seuls les derniers octets sont lus
+    """
+    if job_id is not None:
+        status = get_run_status(job_id)
+        if status is not None:
+            return status
     try:
-        resp = log.split()[-1]
-        if resp == "Failed":
-            return resp
-        else:
-            return "Success"
-    except IndexError:
+        with open(get_log_path(name), "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            f.seek(max(size - STATUS_TAIL_SIZE, 0))
+            words = f.read().split()
+    except FileNotFoundError:
         return "No log yet"
+    if not words:
+        return "No log yet"
+    if words[-1] == b"Failed":
+        return "Failed"
+    else:
+        return "Success"